@@ -1,9 +1,94 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, redirect, url_for
+from flask.cli import load_dotenv
+from werkzeug.wsgi import wrap_file
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, StrictUndefined
+from urllib.parse import urlencode, urljoin, urlsplit
 from io import BytesIO
-from datetime import datetime
+from datetime import datetime, timezone
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait as wait_futures
+import click
+import functools
+import base64
+import gzip
+import hashlib
+import http.client
+import itertools
+import json
+import mimetypes
+import mmap
+import os
+import re
+import ssl
+import struct
+import threading
+import time
+import urllib.request
+
+# Settings from .env next to this file (see .env.example); variables already
+# set in the environment take precedence
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 app.config['SECRET_KEY'] = 'voron-configurator-secret-key'
+# Tunables - override with FLASK_-prefixed environment variables,
+# e.g. FLASK_GENERATION_CACHE_SIZE=4096
+app.config.from_mapping(
+    GENERATION_CACHE_SIZE=1024,
+    # Generated configs kept for GET /api/download/<content_hash>
+    CONFIG_STORE_SIZE=1024,
+    # Generated-vs-reference diffs kept for /api/reference-config/diff
+    REFERENCE_DIFF_CACHE_SIZE=256,
+    # Pre-rendered config pack built with `flask build-pack`; None renders on demand
+    CONFIG_PACK_PATH=None,
+    # Cache lifetime for GET /printer.cfg and GET /api/download responses
+    PRINTER_CFG_MAX_AGE=86400,
+    # Cache lifetime for GET /api/bootstrap and GET /api/reference-configs
+    CATALOG_MAX_AGE=86400,
+    # Responses of at least GZIP_MIN_SIZE bytes are gzip'd for clients that
+    # accept it; compressed bodies with a strong ETag are cached
+    GZIP_MIN_SIZE=1024,
+    GZIP_LEVEL=6,
+    GZIP_CACHE_SIZE=256,
+    # Lifetime of content-hashed static URLs
+    STATIC_IMMUTABLE_MAX_AGE=31536000,
+    # Compiled config templates are cached here between worker boots
+    CFG_TEMPLATE_CACHE_DIR=os.path.join(app.instance_path, 'jinja_cache'),
+    # /api/generate/batch limits; batches with more uncached combinations than
+    # the threshold are rendered in a process pool (workers default to CPU count)
+    BATCH_MAX_SIZE=1000,
+    BATCH_POOL_THRESHOLD=512,
+    BATCH_POOL_WORKERS=None,
+    # LDO reference configs are cached on disk and revalidated with
+    # If-None-Match / If-Modified-Since once older than the TTL (seconds)
+    REFERENCE_CACHE_DIR=os.path.join(app.instance_path, 'reference_cache'),
+    REFERENCE_CACHE_TTL=3600,
+    # Past the TTL, entries are served stale while a background refresh runs
+    # for up to REFERENCE_MAX_STALE seconds, and for up to
+    # REFERENCE_STALE_IF_ERROR seconds when upstream is failing
+    REFERENCE_MAX_STALE=86400,
+    REFERENCE_STALE_IF_ERROR=7 * 86400,
+    # Upstream fetches share keep-alive connections, at most
+    # REFERENCE_POOL_SIZE idle per host; timeouts are in seconds
+    REFERENCE_CONNECT_TIMEOUT=3,
+    REFERENCE_READ_TIMEOUT=10,
+    REFERENCE_POOL_SIZE=4,
+    # Total time allowed per upstream fetch, across connect, redirects and body
+    REFERENCE_FETCH_DEADLINE=8,
+    # Consecutive upstream failures that open the circuit, and seconds it stays
+    # open before a single probe request is let through
+    REFERENCE_BREAKER_THRESHOLD=5,
+    REFERENCE_BREAKER_RESET=30,
+    # Fetch every reference config into the cache at startup; /api/ready
+    # reports ready once that finishes or the budget (seconds) runs out
+    REFERENCE_PREFETCH=False,
+    REFERENCE_PREFETCH_CONCURRENCY=4,
+    REFERENCE_PREFETCH_BUDGET=15,
+    # Offline snapshot of every reference config written by
+    # `flask refresh-references`; entries in it are served without the network
+    REFERENCE_SNAPSHOT_PATH=os.path.join(app.instance_path, 'reference_snapshot.json.gz'),
+)
+app.config.from_prefixed_env()
 
 # Configuration definitions - Based on LDO Kits
 PRINTERS = {
@@ -513,63 +598,1322 @@ LDO_REFERENCE_CONFIGS = {
     }
 }
 
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class UpstreamError(Exception):
+    """An upstream server answered with an error status."""
+
+
+class HTTPConnectionPool:
+    """Thread-safe pool of keep-alive HTTP(S) connections, per host.
+
+    Each request borrows an idle connection for its (scheme, host, port) or
+    opens a new one; afterwards the connection goes back to the pool unless
+    the server asked to close it or maxsize connections are already idle.
+    Connections are opened with connect_timeout and then switched to
+    read_timeout; an optional per-request deadline caps both. A GET on a
+    reused connection that the server has since closed is retried once on a
+    fresh connection. Proxies come from the usual *_proxy environment
+    variables, as with urllib.
+    """
+
+    def __init__(self, connect_timeout, read_timeout, maxsize):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.maxsize = maxsize
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+        self.requests = 0
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+        self.in_use = 0
+
+    def _proxy(self, scheme, host):
+        proxy = urllib.request.getproxies().get(scheme)
+        if not proxy or urllib.request.proxy_bypass(host):
+            return None
+        return urlsplit(proxy if '://' in proxy else f'http://{proxy}')
+
+    def _new_connection(self, scheme, host, port):
+        proxy = self._proxy(scheme, host)
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        kwargs = {'context': self._ssl_context} if scheme == 'https' else {}
+        if proxy is None:
+            return connection_class(host, port, timeout=self.connect_timeout, **kwargs)
+        if scheme == 'https':
+            connection = connection_class(proxy.hostname, proxy.port or 80, timeout=self.connect_timeout, **kwargs)
+            headers = {}
+            if proxy.username:
+                credentials = f'{proxy.username}:{proxy.password or ""}'.encode('utf-8')
+                headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(credentials).decode('ascii')
+            connection.set_tunnel(host, port, headers=headers)
+            return connection
+        connection = http.client.HTTPConnection(proxy.hostname, proxy.port or 80, timeout=self.connect_timeout)
+        connection.absolute_target = True
+        return connection
+
+    @staticmethod
+    def _timeout(timeout, deadline):
+        """timeout capped by the time left before deadline (a time.monotonic() value)"""
+        if deadline is None:
+            return timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError('upstream deadline exceeded')
+        return min(timeout, remaining)
+
+    def _acquire(self, key, deadline, fresh=False):
+        with self._lock:
+            self.requests += 1
+            self.in_use += 1
+            idle = self._idle.get(key)
+            if idle and not fresh:
+                self.reused += 1
+                return idle.pop(), True
+            self.opened += 1
+        connection = self._new_connection(*key)
+        connection.timeout = self._timeout(self.connect_timeout, deadline)
+        connection.connect()
+        return connection, False
+
+    def _read_body(self, connection, response, deadline):
+        if deadline is None:
+            return response.read()
+        chunks = []
+        while True:
+            # read1 does a single recv, so a body trickled in byte by byte
+            # still sees the deadline between reads
+            connection.sock.settimeout(self._timeout(self.read_timeout, deadline))
+            chunk = response.read1(65536)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def _release(self, key, connection, reusable):
+        with self._lock:
+            self.in_use -= 1
+            idle = self._idle.setdefault(key, [])
+            if reusable and len(idle) < self.maxsize:
+                idle.append(connection)
+                return
+            self.discarded += 1
+        connection.close()
+
+    def request(self, method, url, headers=None, deadline=None):
+        """Send a request, returning (status, headers, body).
+
+        deadline (a time.monotonic() value) bounds the whole request - connect,
+        retry and body - on top of the per-operation timeouts.
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+
+        for attempt in range(2):
+            try:
+                # The retry skips the idle list: connections idle as long as the
+                # one that just failed have most likely been closed too
+                connection, reused = self._acquire(key, deadline, fresh=attempt > 0)
+            except Exception:
+                with self._lock:
+                    self.in_use -= 1
+                raise
+            try:
+                connection.sock.settimeout(self._timeout(self.read_timeout, deadline))
+                connection.request(
+                    method,
+                    url if getattr(connection, 'absolute_target', False) else target,
+                    headers=headers or {},
+                )
+                response = connection.getresponse()
+                body = self._read_body(connection, response, deadline)
+            except ConnectionError:
+                self._release(key, connection, reusable=False)
+                if reused and attempt == 0 and method == 'GET':
+                    continue
+                raise
+            except Exception:
+                self._release(key, connection, reusable=False)
+                raise
+            self._release(key, connection, reusable=not response.will_close)
+            return response.status, response.headers, body
+
+    def close(self):
+        with self._lock:
+            connections = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
+
+    def stats(self):
+        idle = sum(len(connections) for connections in self._idle.values())
+        return {
+            'requests': self.requests,
+            'opened': self.opened,
+            'reused': self.reused,
+            'discarded': self.discarded,
+            'idle': idle,
+            'in_use': self.in_use,
+            'open': idle + self.in_use,
+            'maxsize': self.maxsize,
+        }
+
+
+class CircuitOpenError(UpstreamError):
+    """The circuit breaker is open, so the upstream was not contacted."""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker around an unreliable upstream.
+
+    failure_threshold consecutive failures open the circuit, and while it is
+    open allow() refuses every call. After reset_timeout seconds one probe
+    call is let through (half-open): success closes the circuit, failure
+    opens it again for another reset_timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.trips += 1
+            self._probing = False
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'trips': self.trips,
+            'rejected': self.rejected,
+        }
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key onto one execution.
+
+    The first caller for a key (the originating call) runs the function; any
+    caller arriving while it is in flight waits for and shares its result or
+    exception instead of running it again.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.originating = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            originating = call is None
+            if originating:
+                call = self._calls[key] = self._Call()
+                self.originating += 1
+            else:
+                self.coalesced += 1
+        if not originating:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        return {
+            'originating': self.originating,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._calls),
+        }
+
+
+class ReferenceCache:
+    """Disk-backed cache of reference config bodies keyed by URL.
+
+    Entries younger than ttl are served without touching the network. Older
+    entries are revalidated with the stored ETag / Last-Modified, so an
+    unchanged upstream answers 304 and only the freshness timestamp moves.
+    Each entry is a body file plus a JSON metadata file named by the URL hash.
+
+    Up to max_stale seconds past the ttl an entry is still served at once
+    while a background thread revalidates it (stale-while-revalidate). When
+    a blocking revalidation fails, an entry up to stale_if_error seconds past
+    the ttl is served instead of raising (stale-if-error).
+
+    Upstream fetches go through an optional CircuitBreaker, which fails fast
+    (and so falls back to stale-if-error) while upstream is down, and each
+    fetch, redirects included, must finish within deadline seconds.
+    """
+
+    def __init__(self, cache_dir, ttl, client, max_stale=0, stale_if_error=0, breaker=None, deadline=None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.client = client
+        self.breaker = breaker
+        self.deadline = deadline
+        self.max_stale = max_stale
+        self.stale_if_error = stale_if_error
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresher = None
+        self.hits = 0
+        self.revalidated = 0
+        self.fetches = 0
+        self.errors = 0
+        self.stale_served = 0
+        self.stale_on_error = 0
+        # Concurrent misses for the same URL share one upstream fetch
+        self._flight = SingleFlight()
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+            except OSError as e:
+                app.logger.warning('Reference cache is memory-only: %s', e)
+                self.cache_dir = None
+
+    def _path(self, url, suffix):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + suffix)
+
+    def _load(self, url):
+        entry = self._entries.get(url)
+        if entry is not None or not self.cache_dir:
+            return entry
+        try:
+            with open(self._path(url, '.json')) as f:
+                entry = json.load(f)
+            with open(self._path(url, '.cfg'), 'rb') as f:
+                entry['body'] = f.read()
+        except (OSError, ValueError):
+            return None
+        self._entries[url] = entry
+        return entry
+
+    def _write(self, path, data):
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _store(self, url, entry, body_changed):
+        with self._lock:
+            self._entries[url] = entry
+        if not self.cache_dir:
+            return
+        meta = {key: value for key, value in entry.items() if key != 'body'}
+        try:
+            if body_changed:
+                self._write(self._path(url, '.cfg'), entry['body'])
+            self._write(self._path(url, '.json'), json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            app.logger.warning('Could not persist reference cache entry for %s: %s', url, e)
+
+    def _fetch(self, url, entry):
+        """Fetch url, conditionally when entry has validators; returns (status, headers, body)"""
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError(f'circuit open, not fetching {url}')
+        deadline = time.monotonic() + self.deadline if self.deadline else None
+        try:
+            for _ in range(5):
+                status, response_headers, body = self.client.request('GET', url, headers, deadline=deadline)
+                if status in (301, 302, 303, 307, 308) and response_headers.get('Location'):
+                    url = urljoin(url, response_headers['Location'])
+                    continue
+                if status >= 500:
+                    raise UpstreamError(f'{url} returned HTTP {status}')
+                break
+            else:
+                raise UpstreamError(f'{url} redirected too many times')
+        except Exception:
+            # Timeouts, connection failures and 5xx count against the upstream
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        if self.breaker is not None:
+            self.breaker.record_success()
+        if status >= 400:
+            raise UpstreamError(f'{url} returned HTTP {status}')
+        return status, response_headers, body
+
+    def _fresh_body(self, url):
+        with self._lock:
+            entry = self._load(url)
+            if entry is not None and time.time() - entry['fetched_at'] < self.ttl:
+                return entry, entry['body']
+            return entry, None
+
+    def get(self, url):
+        """Return the body for url as bytes, fetching or revalidating when stale"""
+        entry, body = self._fresh_body(url)
+        if body is not None:
+            with self._lock:
+                self.hits += 1
+            return body
+
+        staleness = time.time() - entry['fetched_at'] - self.ttl if entry is not None else None
+        if staleness is not None and staleness < self.max_stale:
+            self._refresh_in_background(url)
+            with self._lock:
+                self.stale_served += 1
+            return entry['body']
+
+        try:
+            return self._flight.do(url, self._refresh, url)
+        except Exception as e:
+            if staleness is None or staleness >= self.stale_if_error:
+                raise
+            app.logger.warning('Serving stale %s after failed revalidation: %s', url, e)
+            with self._lock:
+                self.stale_on_error += 1
+            return entry['body']
+
+    def _refresh_in_background(self, url):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+            if self._refresher is None:
+                self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='reference-refresh')
+        self._refresher.submit(self._background_refresh, url)
+
+    def _background_refresh(self, url):
+        try:
+            self._flight.do(url, self._refresh, url)
+        except Exception as e:
+            app.logger.warning('Background refresh of %s failed: %s', url, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(url)
+
+    def _refresh(self, url):
+        # A flight that finished just before this one started may have already
+        # refreshed the entry
+        entry, body = self._fresh_body(url)
+        if body is not None:
+            return body
+
+        try:
+            status, headers, body = self._fetch(url, entry)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+
+        if status == 304 and entry is not None:
+            entry = dict(entry, fetched_at=time.time())
+            self._store(url, entry, body_changed=False)
+            with self._lock:
+                self.revalidated += 1
+            return entry['body']
+
+        entry = {
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'body': body,
+        }
+        self._store(url, entry, body_changed=True)
+        with self._lock:
+            self.fetches += 1
+        return body
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'fetches': self.fetches,
+            'errors': self.errors,
+            'stale_served': self.stale_served,
+            'stale_on_error': self.stale_on_error,
+            'refreshing': len(self._refreshing),
+            'single_flight': self._flight.stats(),
+            'circuit_breaker': self.breaker.stats() if self.breaker is not None else None,
+        }
+
+
+class ReferenceWarmup:
+    """Background prefetch of reference configs into a ReferenceCache.
+
+    Fetches run in a thread pool bounded by max_workers. The ready event is
+    set once every fetch has finished or the time budget has elapsed,
+    whichever comes first. Fetches already running when the budget runs out
+    complete in the background; queued ones are dropped.
+    """
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        self.fetched = 0
+        self.failed = 0
+        self.pending = 0
+
+    def start(self, cache, urls, max_workers, budget):
+        # Reset everything, in case this object was inherited across a fork
+        self.ready = threading.Event()
+        self.finished_at = None
+        self.fetched = self.failed = self.pending = 0
+        self.started_at = time.time()
+        thread = threading.Thread(
+            target=self._run, args=(cache, list(urls), max_workers, budget),
+            name='reference-warmup', daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def _run(self, cache, urls, max_workers, budget):
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='reference-prefetch')
+        try:
+            futures = {executor.submit(cache.get, url): url for url in urls}
+            done, not_done = wait_futures(futures, timeout=budget)
+            for future in done:
+                if future.exception() is None:
+                    self.fetched += 1
+                else:
+                    self.failed += 1
+                    app.logger.warning('Prefetch of %s failed: %s', futures[future], future.exception())
+            self.pending = len(not_done)
+            if not_done:
+                app.logger.warning('Reference prefetch budget of %ss ran out with %d fetches pending',
+                                   budget, len(not_done))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.finished_at = time.time()
+            self.ready.set()
+
+    def status(self):
+        return {
+            'ready': self.ready.is_set(),
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'fetched': self.fetched,
+            'failed': self.failed,
+            'pending': self.pending,
+        }
+
+
+# printer.cfg section templates. Klipper macros are themselves Jinja, so these
+# use << expr >> / <% block %> delimiters and leave {{ }} / {% %} untouched.
+CFG_TEMPLATE_DIR = os.path.join(app.root_path, 'templates', 'cfg')
+
+def create_cfg_template_env(cache_dir):
+    bytecode_cache = None
+    if cache_dir:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        except OSError as e:
+            app.logger.warning('Template bytecode cache disabled: %s', e)
+    return Environment(
+        loader=FileSystemLoader(CFG_TEMPLATE_DIR),
+        bytecode_cache=bytecode_cache,
+        block_start_string='<%',
+        block_end_string='%>',
+        variable_start_string='<<',
+        variable_end_string='>>',
+        comment_start_string='<#',
+        comment_end_string='#>',
+        undefined=StrictUndefined,
+        auto_reload=False,
+    )
+
+def load_cfg_templates(cache_dir):
+    """(env, {name: template}) with every section template compiled once"""
+    env = create_cfg_template_env(cache_dir)
+    try:
+        return env, {name: env.get_template(name) for name in env.list_templates()}
+    except OSError as e:
+        # An existing but read-only cache directory, as in many container
+        # images, only fails once the first compiled template is written
+        app.logger.warning('Template bytecode cache disabled: %s', e)
+    env = create_cfg_template_env(None)
+    return env, {name: env.get_template(name) for name in env.list_templates()}
+
+cfg_template_env, CFG_TEMPLATES = load_cfg_templates(app.config['CFG_TEMPLATE_CACHE_DIR'])
+
+def render_cfg_template(name, **context):
+    """Render a printer.cfg section template from templates/cfg"""
+    return CFG_TEMPLATES[name].render(context)
+
+# Generation options resolved to catalog keys - unknown IDs collapse onto the
+# same defaults generate_config has always fallen back to
+GenerateOptions = namedtuple('GenerateOptions', [
+    'printer', 'size', 'main_board', 'toolhead_board', 'motors', 'probe', 'print_start', 'extruder',
+])
+
+generation_cache = LRUCache(app.config['GENERATION_CACHE_SIZE'])
+# Content-addressed store of encoded configs, keyed by content hash
+config_store = LRUCache(app.config['CONFIG_STORE_SIZE'])
+# Reference diffs keyed by (generated content hash, reference content hash)
+reference_diff_cache = LRUCache(app.config['REFERENCE_DIFF_CACHE_SIZE'])
+upstream_pool = HTTPConnectionPool(
+    app.config['REFERENCE_CONNECT_TIMEOUT'],
+    app.config['REFERENCE_READ_TIMEOUT'],
+    app.config['REFERENCE_POOL_SIZE'],
+)
+reference_cache = ReferenceCache(
+    app.config['REFERENCE_CACHE_DIR'],
+    app.config['REFERENCE_CACHE_TTL'],
+    upstream_pool,
+    max_stale=app.config['REFERENCE_MAX_STALE'],
+    stale_if_error=app.config['REFERENCE_STALE_IF_ERROR'],
+    breaker=CircuitBreaker(app.config['REFERENCE_BREAKER_THRESHOLD'], app.config['REFERENCE_BREAKER_RESET']),
+    deadline=app.config['REFERENCE_FETCH_DEADLINE'],
+)
+reference_warmup = ReferenceWarmup()
+
+def resolve_generate_options(data):
+    """Resolve request options to catalog keys, substituting defaults for unknown IDs"""
+    def resolve(catalog, key, default):
+        # Non-string values (lists, numbers, null from JSON) are unknown IDs too
+        return key if isinstance(key, str) and key in catalog else default
+
+    printer_type = resolve(PRINTERS, data.get('printer', 'voron2.4'), 'voron2.4')
+    return GenerateOptions(
+        printer=printer_type,
+        size=resolve(PRINTERS[printer_type]['sizes'], data.get('size', '300'), '300'),
+        main_board=resolve(MAIN_BOARDS, data.get('main_board', 'leviathan'), 'leviathan'),
+        toolhead_board=resolve(TOOLHEAD_BOARDS, data.get('toolhead_board', 'nitehawk'), 'nitehawk'),
+        motors=resolve(MOTORS, data.get('motors', 'ldo'), 'ldo'),
+        probe=resolve(PROBES, data.get('probe', 'tap'), 'tap'),
+        print_start=resolve(PRINT_START_OPTIONS, data.get('print_start', 'standard'), 'standard'),
+        extruder=resolve(EXTRUDERS, data.get('extruder', 'g2e_9t'), 'g2e_9t'),
+    )
+
+def render_generated_config(options):
+    """Render printer.cfg for resolved options, returning (config, metadata)"""
+    config_content = generate_comprehensive_cfg(options)
+    return config_content, generate_metadata(options, config_content)
+
+def config_content_hash(config_content):
+    """Stable content hash of a config, used as its strong ETag"""
+    return hashlib.sha256(config_content.encode('utf-8')).hexdigest()
+
+def generate_metadata(options, config_content):
+    """Display names for resolved options plus the config's content hash"""
+    printer = PRINTERS[options.printer]
+    return {
+        'printer': printer['name'],
+        'size': printer['sizes'][options.size]['name'],
+        'main_board': MAIN_BOARDS[options.main_board]['name'],
+        'toolhead_board': TOOLHEAD_BOARDS[options.toolhead_board]['name'],
+        'motors': MOTORS[options.motors]['name'],
+        'probe': PROBES[options.probe]['name'],
+        'print_start': PRINT_START_OPTIONS[options.print_start]['name'],
+        'content_hash': config_content_hash(config_content),
+    }
+
+def get_generated_config(options):
+    """Return (config, metadata) for resolved options, rendering on a cache miss"""
+    entry = generation_cache.get(options)
+    if entry is None:
+        if config_pack is not None and config_pack.has(options):
+            config_content = config_pack.read(options).decode('utf-8')
+            entry = (config_content, generate_metadata(options, config_content))
+        else:
+            entry = render_generated_config(options)
+        cache_generated_config(options, entry)
+    return entry
+
+def cache_generated_config(options, entry):
+    """Keep a newly rendered (config, metadata) in the generation cache and its bytes in config_store"""
+    generation_cache.set(options, entry)
+    # Encoded once per render, so cache hits on /api/generate never touch the store
+    config_content, metadata = entry
+    config_store.set(metadata['content_hash'], config_content.encode('utf-8'))
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+def get_batch_pool():
+    """Process pool shared by batch requests, created on first use"""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(max_workers=batch_pool_workers())
+        return _batch_pool
+
+def batch_pool_workers():
+    return app.config['BATCH_POOL_WORKERS'] or os.cpu_count() or 1
+
+def get_generated_configs(options_list):
+    """Return {options: (config, metadata)} for each unique option set"""
+    results = {}
+    missing = []
+    for options in dict.fromkeys(options_list):
+        entry = generation_cache.get(options)
+        if entry is None:
+            missing.append(options)
+        else:
+            results[options] = entry
+
+    if len(missing) > app.config['BATCH_POOL_THRESHOLD']:
+        chunksize = max(1, len(missing) // (4 * batch_pool_workers()))
+        configs = get_batch_pool().map(generate_comprehensive_cfg, missing, chunksize=chunksize)
+        for options, config_content in zip(missing, configs):
+            results[options] = (config_content, generate_metadata(options, config_content))
+            cache_generated_config(options, results[options])
+    else:
+        for options in missing:
+            results[options] = get_generated_config(options)
+    return results
+
+def iter_generate_options():
+    """Yield every option combination the catalogs allow"""
+    for printer_type, printer in PRINTERS.items():
+        for size in printer['sizes']:
+            for combo in itertools.product(MAIN_BOARDS, TOOLHEAD_BOARDS, MOTORS, PROBES, PRINT_START_OPTIONS, EXTRUDERS):
+                yield GenerateOptions(printer_type, size, *combo)
+
+def compute_generator_fingerprint():
+    """Hash of the catalogs, generator source and section templates - changes whenever generated output could"""
+    digest = hashlib.sha256()
+    catalogs = [PRINTERS, MAIN_BOARDS, TOOLHEAD_BOARDS, EXTRUDERS, MOTORS, PROBES, PRINT_START_OPTIONS]
+    digest.update(json.dumps(catalogs, sort_keys=True).encode('utf-8'))
+    for path in [__file__] + [os.path.join(CFG_TEMPLATE_DIR, name) for name in sorted(CFG_TEMPLATES)]:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+GENERATOR_FINGERPRINT = compute_generator_fingerprint()
+
+
+# Config pack layout: magic, u64 header length, JSON header, concatenated bodies.
+# The header maps '|'-joined option keys to [offset, length, content_hash] within
+# the body area.
+CONFIG_PACK_MAGIC = b'VCPACK1\n'
+
+class _PackEntryReader:
+    """File-like view of one pack entry.
+
+    Exposes the real file descriptor positioned at the entry so servers that
+    implement wsgi.file_wrapper with sendfile (e.g. gunicorn) can hand the bytes
+    straight to the socket; read() stops at the entry boundary for the rest.
+    """
+
+    def __init__(self, path, offset, length):
+        self._file = open(path, 'rb')
+        self._file.seek(offset)
+        self._remaining = length
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+class ConfigPack:
+    """Read-only, memory-mapped pack of pre-rendered configs"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._mmap[:len(CONFIG_PACK_MAGIC)] != CONFIG_PACK_MAGIC:
+                raise ValueError(f'{path} is not a config pack')
+            header_start = len(CONFIG_PACK_MAGIC) + 8
+            (header_length,) = struct.unpack('<Q', self._mmap[len(CONFIG_PACK_MAGIC):header_start])
+            header = json.loads(self._mmap[header_start:header_start + header_length])
+            self.fingerprint = header['fingerprint']
+            self.compressed = header['compressed']
+            self._entries = header['entries']
+            self._data_start = header_start + header_length
+        except BaseException:
+            self._mmap.close()
+            raise
+
+    @staticmethod
+    def entry_key(options):
+        return '|'.join(options)
+
+    def has(self, options):
+        return self.entry_key(options) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def content_hash(self, options):
+        """Content hash of the uncompressed entry"""
+        return self._entries[self.entry_key(options)][2]
+
+    def view(self, options):
+        """Zero-copy view of the stored (possibly gzip'd) entry bytes"""
+        offset, length, _ = self._entries[self.entry_key(options)]
+        start = self._data_start + offset
+        return memoryview(self._mmap)[start:start + length]
+
+    def read(self, options):
+        """Uncompressed entry bytes"""
+        view = self.view(options)
+        return gzip.decompress(view) if self.compressed else bytes(view)
+
+    def open_entry(self, options):
+        """File-like reader over the stored entry bytes, plus their length"""
+        offset, length, _ = self._entries[self.entry_key(options)]
+        return _PackEntryReader(self.path, self._data_start + offset, length), length
+
+    def close(self):
+        self._mmap.close()
+
+def build_config_pack(path, compress=False, options_iter=None):
+    """Render every option combination into a pack file at path"""
+    entries = {}
+    bodies = []
+    offset = 0
+    for options in options_iter if options_iter is not None else iter_generate_options():
+        config_content, metadata = render_generated_config(options)
+        body = config_content.encode('utf-8')
+        if compress:
+            body = gzip.compress(body, compresslevel=9, mtime=0)
+        entries[ConfigPack.entry_key(options)] = [offset, len(body), metadata['content_hash']]
+        bodies.append(body)
+        offset += len(body)
+
+    header = json.dumps({
+        'fingerprint': GENERATOR_FINGERPRINT,
+        'compressed': compress,
+        'entries': entries,
+    }).encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(CONFIG_PACK_MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for body in bodies:
+            f.write(body)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+def load_config_pack(path):
+    """Open the pack at path, or return None if it is missing, unreadable or stale"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        pack = ConfigPack(path)
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        app.logger.warning('Ignoring config pack %s: %s - rebuild with `flask build-pack`', path, e)
+        return None
+    if pack.fingerprint != GENERATOR_FINGERPRINT:
+        app.logger.warning('Ignoring stale config pack %s - rebuild with `flask build-pack`', path)
+        pack.close()
+        return None
+    return pack
+
+config_pack = load_config_pack(app.config['CONFIG_PACK_PATH'])
+
+@app.cli.command('build-pack')
+@click.option('--output', '-o', default=None, help='Pack file path (defaults to CONFIG_PACK_PATH)')
+@click.option('--gzip/--no-gzip', 'compress', default=False, help='Gzip each entry')
+def build_pack_command(output, compress):
+    """Pre-render every config combination into a pack file."""
+    path = output or app.config['CONFIG_PACK_PATH'] or os.path.join('build', 'printer_configs.pack')
+    count = build_config_pack(path, compress=compress)
+    click.echo(f'Wrote {count} configs to {path}')
+
+def etag_response(etag, build_response):
+    """Answer 304 if the client already holds etag, otherwise build the response and tag it"""
+    # compress_response tags gzip'd bodies etag + '-gzip'; either form is current
+    for held in (etag, etag + GZIP_ETAG_SUFFIX):
+        if request.if_none_match.contains(held):
+            response = Response(status=304)
+            response.set_etag(held)
+            return response
+    response = build_response()
+    response.set_etag(etag)
+    return response
+
+# On-the-fly gzip for API and page responses. Bodies with a strong ETag are
+# deterministic, so their compressed form is cached under the gzip ETag.
+GZIP_ETAG_SUFFIX = '-gzip'
+GZIP_MIMETYPES = {'application/json', 'text/plain', 'text/html', 'text/css', 'text/javascript'}
+gzip_cache = LRUCache(app.config['GZIP_CACHE_SIZE'])
+
+@app.after_request
+def compress_response(response):
+    """Gzip large uncompressed bodies for clients that accept it"""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.content_encoding
+        or response.mimetype not in GZIP_MIMETYPES
+        or response.content_length is None
+        or response.content_length < app.config['GZIP_MIN_SIZE']
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in request.accept_encodings:
+        return response
+
+    etag, weak = response.get_etag()
+    # A content hash tags the JSON from /api/generate as well as the plain text
+    # from /printer.cfg, so the mimetype is part of the key
+    key = (etag, response.mimetype) if etag and not weak else None
+    body = gzip_cache.get(key) if key else None
+    if body is None:
+        body = gzip.compress(response.get_data(), compresslevel=app.config['GZIP_LEVEL'], mtime=0)
+        if key:
+            gzip_cache.set(key, body)
+    response.set_data(body)
+    response.content_encoding = 'gzip'
+    if etag:
+        response.set_etag(etag + GZIP_ETAG_SUFFIX, weak)
+    return response
+
+# Static files with an up-to-date .gz sibling written by `flask compress-static`
+# are served gzip'd to clients that accept it
+STATIC_GZIP_SUFFIXES = ('.js', '.css', '.svg', '.html', '.json', '.txt', '.map')
+
+def compress_static_files(folder):
+    """Write a .gz sibling for every compressible file under folder; returns (files, bytes in, bytes out)"""
+    files = size_in = size_out = 0
+    for root, _, names in os.walk(folder):
+        for name in names:
+            if not name.endswith(STATIC_GZIP_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) >= len(data):
+                continue
+            tmp_path = f'{path}.gz.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(compressed)
+            os.replace(tmp_path, f'{path}.gz')
+            files += 1
+            size_in += len(data)
+            size_out += len(compressed)
+    return files, size_in, size_out
+
+def find_static_gz(folder):
+    """{static filename: .gz path} for files whose .gz sibling is at least as new"""
+    found = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            if not name.endswith(STATIC_GZIP_SUFFIXES) or name + '.gz' not in names:
+                continue
+            path = os.path.join(root, name)
+            if os.path.getmtime(path + '.gz') >= os.path.getmtime(path):
+                found[os.path.relpath(path, folder).replace(os.sep, '/')] = path + '.gz'
+    return found
+
+static_gz = find_static_gz(app.static_folder)
+
+# Content-hashed static URLs: url_for('static', filename='js/app.js') yields
+# js/app.<hash>.js, which is served with an immutable one-year lifetime, so a
+# deploy changes the URL of exactly the files that changed
+def hash_static_files(folder):
+    """{static filename: short content hash} for every file under folder"""
+    hashes = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            if name.endswith('.gz'):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            hashes[os.path.relpath(path, folder).replace(os.sep, '/')] = digest
+    return hashes
+
+static_hashes = hash_static_files(app.static_folder)
+FINGERPRINTED_STATIC = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{12})(?P<ext>\.[^./]+)$')
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    if endpoint != 'static' or 'filename' not in values:
+        return
+    filename = values['filename']
+    digest = static_hashes.get(filename)
+    if digest is not None:
+        stem, ext = os.path.splitext(filename)
+        values['filename'] = f'{stem}.{digest}{ext}'
+
+def serve_static(filename):
+    """Static view: resolves fingerprinted names and prefers the precompressed sibling"""
+    immutable = False
+    match = FINGERPRINTED_STATIC.match(filename)
+    if match and match['stem'] + match['ext'] in static_hashes:
+        filename = match['stem'] + match['ext']
+        # A hash from another deploy still gets the current file, just not cached forever
+        immutable = static_hashes[filename] == match['hash']
+
+    gz_path = static_gz.get(filename)
+    if gz_path is not None and 'gzip' in request.accept_encodings:
+        response = send_file(
+            gz_path,
+            mimetype=mimetypes.guess_type(filename)[0],
+            max_age=app.get_send_file_max_age(filename),
+        )
+        response.content_encoding = 'gzip'
+    else:
+        response = app.send_static_file(filename)
+    if gz_path is not None:
+        response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['STATIC_IMMUTABLE_MAX_AGE']
+        response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = serve_static
+
+@app.cli.command('compress-static')
+def compress_static_command():
+    """Write .gz siblings of static assets for precompressed serving."""
+    files, size_in, size_out = compress_static_files(app.static_folder)
+    click.echo(f'Compressed {files} static files: {size_in} -> {size_out} bytes')
+
+# Pages that depend only on the catalogs, the template and the static hashes are
+# identical for every visitor, so they are rendered once and served as bytes.
+# Catalogs and static hashes are fixed for the life of the process, like
+# BOOTSTRAP_JSON. The key holds the Template object itself: Jinja hands back a
+# new one when the file changes and TEMPLATES_AUTO_RELOAD is on, which is
+# exactly when a fresh render would differ.
+RenderedPage = namedtuple('RenderedPage', ['body', 'gzip_body', 'etag'])
+page_cache = LRUCache(16)
+
+def cached_page_response(template_name, **context):
+    """Serve a rendered template from page_cache with a strong ETag and a precompressed body"""
+    template = app.jinja_env.get_template(template_name)
+    key = (template, request.script_root)
+    page = page_cache.get(key)
+    if page is None:
+        body = render_template(template, **context).encode('utf-8')
+        page = RenderedPage(body, gzip.compress(body, compresslevel=9, mtime=0), hashlib.sha256(body).hexdigest())
+        page_cache.set(key, page)
+
+    gzipped = 'gzip' in request.accept_encodings
+    etag = page.etag + GZIP_ETAG_SUFFIX if gzipped else page.etag
+
+    def build_response():
+        if gzipped:
+            response = Response(page.gzip_body, mimetype='text/html')
+            response.content_encoding = 'gzip'
+            return response
+        return Response(page.body, mimetype='text/html')
+
+    response = etag_response(page.etag, build_response)
+    if response.status_code == 200:
+        response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    # The page names this deploy's fingerprinted assets, so always revalidate
+    response.cache_control.no_cache = True
+    return response
+
 @app.route('/')
 def index():
-    return render_template('index.html', 
-                         printers=PRINTERS, 
-                         main_boards=MAIN_BOARDS,
-                         toolhead_boards=TOOLHEAD_BOARDS,
-                         motors=MOTORS,
-                         probes=PROBES,
-                         extruders=EXTRUDERS,
-                         themes=THEMES,
-                         print_start_options=PRINT_START_OPTIONS,
-                         ldo_reference_configs=LDO_REFERENCE_CONFIGS,
-                         default_theme='arctic')
+    return cached_page_response('index.html',
+                                printers=PRINTERS,
+                                main_boards=MAIN_BOARDS,
+                                toolhead_boards=TOOLHEAD_BOARDS,
+                                motors=MOTORS,
+                                probes=PROBES,
+                                extruders=EXTRUDERS,
+                                themes=THEMES,
+                                print_start_options=PRINT_START_OPTIONS,
+                                ldo_reference_configs=LDO_REFERENCE_CONFIGS,
+                                default_theme='arctic')
 
 @app.route('/api/generate', methods=['POST'])
 def generate_config():
-    data = request.json
-    
-    printer_type = data.get('printer', 'voron2.4')
-    size = data.get('size', '300')
-    main_board_id = data.get('main_board', 'leviathan')
-    toolhead_board_id = data.get('toolhead_board', 'nitehawk')
-    motor_kit = data.get('motors', 'ldo')
-    probe_type = data.get('probe', 'tap')
-    print_start_type = data.get('print_start', 'standard')
-    extruder_type = data.get('extruder', 'g2e_9t')
-    
-    # Get selected options
-    printer = PRINTERS.get(printer_type, PRINTERS['voron2.4'])
-    printer_size = printer['sizes'].get(size, printer['sizes']['300'])
-    main_board = MAIN_BOARDS.get(main_board_id, MAIN_BOARDS['leviathan'])
-    toolhead_board = TOOLHEAD_BOARDS.get(toolhead_board_id, TOOLHEAD_BOARDS['nitehawk'])
-    motor_config = MOTORS.get(motor_kit, MOTORS['ldo'])
-    probe = PROBES.get(probe_type, PROBES['tap'])
-    extruder_config = EXTRUDERS.get(extruder_type, EXTRUDERS['g2e_9t'])
-    
-    # Generate single comprehensive printer.cfg
-    config_content = generate_comprehensive_cfg(
-        printer, printer_size, main_board, toolhead_board, motor_config, probe, printer_type, print_start_type, extruder_config
-    )
-    
-    return jsonify({
+    options = resolve_generate_options(request.json)
+    config_content, metadata = get_generated_config(options)
+
+    # Generation is deterministic, so a client holding this content hash can
+    # revalidate with If-None-Match and skip the body entirely
+    return etag_response(metadata['content_hash'], lambda: jsonify({
         'success': True,
         'config': config_content,
         'filename': 'printer.cfg',
-        'metadata': {
-            'printer': printer['name'],
-            'size': printer_size['name'],
-            'main_board': main_board['name'],
-            'toolhead_board': toolhead_board['name'],
-            'motors': motor_config['name'],
-            'probe': probe['name'],
-            'print_start': PRINT_START_OPTIONS.get(print_start_type, PRINT_START_OPTIONS['standard'])['name'],
-            'generated_at': datetime.now().isoformat(),
-        }
+        'metadata': metadata
+    }))
+
+@app.route('/api/generate/stream', methods=['GET', 'POST'])
+def generate_config_stream():
+    """Stream printer.cfg as plain text, one section per chunk"""
+    data = (request.get_json(silent=True) if request.method == 'POST' else request.args) or {}
+    if not isinstance(data, dict):
+        return jsonify({
+            'success': False,
+            'error': 'Expected an object of options'
+        }), 400
+    options = resolve_generate_options(data)
+
+    def generate():
+        for section in iter_config_sections(options):
+            yield section.encode('utf-8')
+
+    return Response(generate(), mimetype='text/plain')
+
+@app.route('/api/generate/batch', methods=['POST'])
+def generate_config_batch():
+    """Generate configs for a list of option sets, returned in input order.
+
+    Accepts a JSON array or {"configs": [...]}; identical option sets are only
+    rendered once. Responds with a JSON array, or NDJSON (one result per line)
+    when requested with ?format=ndjson or Accept: application/x-ndjson.
+    """
+    data = request.json
+    configs = data.get('configs') if isinstance(data, dict) else data
+    if not isinstance(configs, list) or not all(isinstance(c, dict) for c in configs):
+        return jsonify({
+            'success': False,
+            'error': 'Expected a list of option objects'
+        }), 400
+    if len(configs) > app.config['BATCH_MAX_SIZE']:
+        return jsonify({
+            'success': False,
+            'error': f"Batch exceeds {app.config['BATCH_MAX_SIZE']} configs"
+        }), 413
+
+    options_list = [resolve_generate_options(c) for c in configs]
+    rendered = get_generated_configs(options_list)
+
+    def result(options):
+        config_content, metadata = rendered[options]
+        return {'config': config_content, 'filename': 'printer.cfg', 'metadata': metadata}
+
+    ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+    if ndjson:
+        def generate():
+            for options in options_list:
+                yield json.dumps(result(options)) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    return jsonify({
+        'success': True,
+        'unique': len(rendered),
+        'results': [result(options) for options in options_list]
+    })
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Expose cache counters for monitoring"""
+    return jsonify({
+        'success': True,
+        'generation_cache': generation_cache.stats(),
+        'config_store': config_store.stats(),
+        'page_cache': page_cache.stats(),
+        'section_cache': section_cache_stats(),
+        'reference_cache': reference_cache.stats(),
+        'upstream_pool': upstream_pool.stats(),
+        'reference_parse_cache': parse_reference_config.cache_info()._asdict(),
+        'reference_diff_cache': reference_diff_cache.stats(),
+        'reference_snapshot': reference_snapshot.stats() if reference_snapshot is not None else None,
     })
 
+def config_file_response(options, as_attachment=False):
+    """printer.cfg as text/plain with validators, streamed from the config pack when it has the entry"""
+    if config_pack is not None and config_pack.has(options):
+        etag = config_pack.content_hash(options)
+        gzipped = config_pack.compressed and 'gzip' in request.accept_encodings
+        if gzipped:
+            # The gzip'd bytes are a different representation and need their own strong ETag
+            etag += '-gzip'
+
+        def build_response():
+            if config_pack.compressed and not gzipped:
+                return Response(config_pack.read(options), mimetype='text/plain')
+            reader, length = config_pack.open_entry(options)
+            response = Response(wrap_file(request.environ, reader), mimetype='text/plain', direct_passthrough=True)
+            response.content_length = length
+            if gzipped:
+                response.content_encoding = 'gzip'
+            return response
+
+        response = etag_response(etag, build_response)
+        if config_pack.compressed:
+            response.vary.add('Accept-Encoding')
+    else:
+        config_content, metadata = get_generated_config(options)
+        response = etag_response(metadata['content_hash'], lambda: Response(config_content, mimetype='text/plain'))
+
+    if as_attachment:
+        response.headers['Content-Disposition'] = 'attachment; filename=printer.cfg'
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['PRINTER_CFG_MAX_AGE']
+    return response
+
+def canonical_query(options):
+    return urlencode(options._asdict())
+
+@app.route('/printer.cfg', methods=['GET'])
+def printer_cfg():
+    """Generated printer.cfg as cacheable plain text.
+
+    Requests are redirected to one canonical query string (every option, resolved,
+    in a fixed order) so a fronting cache stores each config exactly once.
+    """
+    options = resolve_generate_options(request.args)
+    query = canonical_query(options)
+    if request.query_string.decode('utf-8') != query:
+        response = redirect(f"{url_for('printer_cfg')}?{query}", code=301)
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['PRINTER_CFG_MAX_AGE']
+        return response
+    return config_file_response(options)
+
+@app.route('/api/download', methods=['GET'])
+def download_generated_config():
+    """Download printer.cfg for the options in the query string"""
+    return config_file_response(resolve_generate_options(request.args), as_attachment=True)
+
+@app.route('/api/download/<content_hash>', methods=['GET'])
+def download_stored_config(content_hash):
+    """Download a previously generated config by its content hash.
+
+    The store is per process, so under several workers the hash is often
+    unknown here. Clients pass the generation options in the query string;
+    on a miss they are re-rendered (usually a generation or section cache
+    hit) and served if they reproduce the requested hash.
+    """
+    body = config_store.get(content_hash)
+    if body is None and request.args:
+        config_content, metadata = get_generated_config(resolve_generate_options(request.args))
+        if metadata['content_hash'] == content_hash:
+            body = config_content.encode('utf-8')
+            config_store.set(content_hash, body)
+    if body is None:
+        return jsonify({
+            'success': False,
+            'error': 'Config not found'
+        }), 404
+
+    response = etag_response(content_hash, lambda: Response(body, mimetype='text/plain'))
+    response.headers['Content-Disposition'] = 'attachment; filename=printer.cfg'
+    # The URL names the exact bytes, so they can be cached forever
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/api/download', methods=['POST'])
 def download_config():
     data = request.json
@@ -587,9 +1931,8 @@ def download_config():
         download_name=filename
     )
 
-@app.route('/api/reference-configs', methods=['GET'])
-def get_reference_configs():
-    """Return ALL available LDO reference configs across all printer types and boards"""
+def build_reference_catalog():
+    """Flatten LDO_REFERENCE_CONFIGS into {printer_board_revision: entry} with display names"""
     # Printer display names
     printer_names = {
         'voron2.4': '2.4',
@@ -617,21 +1960,173 @@ def get_reference_configs():
                     'revision': revision
                 }
     
-    return jsonify({
-        'success': True,
-        'configs': all_configs
-    })
+    return all_configs
+
+PrecomputedJSON = namedtuple('PrecomputedJSON', ['body', 'etag'])
+
+def precompute_json(payload):
+    """Serialize a payload that is fixed for the life of the process, with its strong ETag"""
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return PrecomputedJSON(body, hashlib.sha256(body).hexdigest())
+
+def precomputed_json_response(document):
+    """Serve a PrecomputedJSON, answering 304 when the client already holds it"""
+    response = etag_response(document.etag, lambda: Response(document.body, mimetype='application/json'))
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['CATALOG_MAX_AGE']
+    return response
+
+# Catalog data is static for the life of the process, so these payloads are
+# built and serialized once at import
+REFERENCE_CATALOG = build_reference_catalog()
+REFERENCE_CATALOG_JSON = precompute_json({
+    'success': True,
+    'configs': REFERENCE_CATALOG,
+})
+BOOTSTRAP_JSON = precompute_json({
+    'success': True,
+    'catalog': {
+        'printers': PRINTERS,
+        'main_boards': MAIN_BOARDS,
+        'toolhead_boards': TOOLHEAD_BOARDS,
+        'motors': MOTORS,
+        'probes': PROBES,
+        'extruders': EXTRUDERS,
+        'print_start_options': PRINT_START_OPTIONS,
+    },
+    'references': REFERENCE_CATALOG,
+    'themes': THEMES,
+    'default_theme': 'arctic',
+})
+
+@app.route('/api/reference-configs', methods=['GET'])
+def get_reference_configs():
+    """Return ALL available LDO reference configs across all printer types and boards"""
+    return precomputed_json_response(REFERENCE_CATALOG_JSON)
+
+@app.route('/api/bootstrap', methods=['GET'])
+def get_bootstrap():
+    """Everything the frontend needs on page load: catalogs, reference list and themes"""
+    return precomputed_json_response(BOOTSTRAP_JSON)
+
+def requested_reference_config(args=None):
+    """LDO_REFERENCE_CONFIGS entry named by printer/board/revision in args (the query string by default), or None"""
+    args = request.args if args is None else args
+    printer_type = args.get('printer', 'voron2.4')
+    board_type = args.get('board', 'leviathan')
+    revision = args.get('revision', 'rev_d')
+    # Non-string values (from a JSON body) name no reference, as in resolve_generate_options
+    if not all(isinstance(value, str) for value in (printer_type, board_type, revision)):
+        return None
+    return LDO_REFERENCE_CONFIGS.get(printer_type, {}).get(board_type, {}).get(revision)
+
+def reference_config_body(url):
+    """Reference config bytes from the offline snapshot, or from GitHub via the reference cache"""
+    body = reference_snapshot.get(url) if reference_snapshot is not None else None
+    if body is None:
+        body = reference_cache.get(url)
+    return body
+
+REFERENCE_SECTION_HEADER = re.compile(r'^\[([^\]]+)\]')
+REFERENCE_INLINE_COMMENT = re.compile(r'\s+[#;].*$')
+
+@functools.lru_cache(maxsize=64)
+def parse_reference_config(body):
+    """Index a Klipper config into sections, keys and 1-based line spans.
+
+    Returns {'sections': [...], 'index': {name: position}, 'content_hash'};
+    each section is {name, start_line, end_line, hash, keys: {key: {value,
+    line, end_line}}} where hash covers the section's keys and values only,
+    so sections that differ in comments or formatting still compare equal.
+    Indented lines continue the previous key's value (gcode blocks), comment
+    lines are skipped and a repeated section name indexes its first occurrence.
+    Cached on the body bytes, so each body is parsed once.
+    """
+    sections = []
+    index = {}
+    section = None
+    key = None
+    for number, line in enumerate(body.decode('utf-8').splitlines(), start=1):
+        stripped = line.strip()
+        header = REFERENCE_SECTION_HEADER.match(line)
+        if header:
+            section = {'name': header.group(1).strip(), 'start_line': number, 'end_line': number, 'keys': {}}
+            index.setdefault(section['name'], len(sections))
+            sections.append(section)
+            key = None
+            continue
+        if section is None or not stripped or stripped[0] in '#;':
+            continue
+        if line[0].isspace() and key is not None:
+            entry = section['keys'][key]
+            entry['value'] = f"{entry['value']}\n{stripped}" if entry['value'] else stripped
+            entry['end_line'] = section['end_line'] = number
+            continue
+        separator = min((i for i in (line.find(':'), line.find('=')) if i > 0), default=-1)
+        if separator < 0:
+            continue
+        key = line[:separator].strip()
+        value = REFERENCE_INLINE_COMMENT.sub('', line[separator + 1:]).strip()
+        section['keys'][key] = {'value': value, 'line': number, 'end_line': number}
+        section['end_line'] = number
+    for section in sections:
+        digest = hashlib.sha256()
+        for key, entry in sorted(section['keys'].items()):
+            digest.update(f'{key}\0{entry["value"]}\0'.encode('utf-8'))
+        section['hash'] = digest.hexdigest()[:16]
+    return {'sections': sections, 'index': index, 'content_hash': hashlib.sha256(body).hexdigest()}
+
+def diff_parsed_configs(reference, generated):
+    """Section- and key-level differences between two parsed configs.
+
+    Sections whose hashes match are only counted, never compared key by key.
+    Changed sections list changed ({key: [reference, generated]}), added and
+    removed keys; sections present on one side only carry their values.
+    """
+    def values(section):
+        return {key: entry['value'] for key, entry in section['keys'].items()}
+
+    def lines(section):
+        return [section['start_line'], section['end_line']]
+
+    summary = {'unchanged': 0, 'changed': 0, 'added': 0, 'removed': 0}
+    sections = []
+    for name, position in reference['index'].items():
+        ref_section = reference['sections'][position]
+        gen_position = generated['index'].get(name)
+        if gen_position is None:
+            summary['removed'] += 1
+            sections.append({'name': name, 'status': 'removed', 'reference_lines': lines(ref_section),
+                             'keys': values(ref_section)})
+            continue
+        gen_section = generated['sections'][gen_position]
+        if ref_section['hash'] == gen_section['hash']:
+            summary['unchanged'] += 1
+            continue
+        ref_values, gen_values = values(ref_section), values(gen_section)
+        summary['changed'] += 1
+        sections.append({
+            'name': name,
+            'status': 'changed',
+            'reference_lines': lines(ref_section),
+            'generated_lines': lines(gen_section),
+            'changed': {key: [value, gen_values[key]] for key, value in ref_values.items()
+                        if key in gen_values and gen_values[key] != value},
+            'added': {key: value for key, value in gen_values.items() if key not in ref_values},
+            'removed': {key: value for key, value in ref_values.items() if key not in gen_values},
+        })
+    for name, position in generated['index'].items():
+        if name not in reference['index']:
+            gen_section = generated['sections'][position]
+            summary['added'] += 1
+            sections.append({'name': name, 'status': 'added', 'generated_lines': lines(gen_section),
+                             'keys': values(gen_section)})
+    return {'summary': summary, 'sections': sections}
 
 @app.route('/api/reference-config', methods=['GET'])
 def get_reference_config_content():
-    """Fetch content of a specific LDO reference config from GitHub"""
-    import urllib.request
-    
-    printer_type = request.args.get('printer', 'voron2.4')
-    board_type = request.args.get('board', 'leviathan')
-    revision = request.args.get('revision', 'rev_d')
-    
-    config_info = LDO_REFERENCE_CONFIGS.get(printer_type, {}).get(board_type, {}).get(revision)
+    """Serve a specific LDO reference config from the offline snapshot, or from GitHub via the reference cache"""
+    config_info = requested_reference_config()
     
     if not config_info:
         return jsonify({
@@ -640,73 +2135,281 @@ def get_reference_config_content():
         }), 404
     
     try:
-        with urllib.request.urlopen(config_info['url'], timeout=10) as response:
-            content = response.read().decode('utf-8')
-            return jsonify({
-                'success': True,
-                'content': content,
-                'name': config_info['name'],
-                'description': config_info['description']
-            })
+        content = reference_config_body(config_info['url']).decode('utf-8')
+        return jsonify({
+            'success': True,
+            'content': content,
+            'name': config_info['name'],
+            'description': config_info['description']
+        })
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/reference-config/sections', methods=['GET'])
+def get_reference_config_sections():
+    """List the sections of a reference config with their line spans and key names"""
+    config_info = requested_reference_config()
+    if not config_info:
+        return jsonify({'success': False, 'error': 'Config not found'}), 404
+
+    try:
+        parsed = parse_reference_config(reference_config_body(config_info['url']))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify({
+        'success': True,
+        'name': config_info['name'],
+        'sections': [
+            {
+                'name': section['name'],
+                'start_line': section['start_line'],
+                'end_line': section['end_line'],
+                'keys': list(section['keys']),
+            }
+            for section in parsed['sections']
+        ],
+    })
+
+@app.route('/api/reference-config/section', methods=['GET'])
+def get_reference_config_section():
+    """Return one section of a reference config (?section=tmc5160 stepper_x) with its text and values"""
+    config_info = requested_reference_config()
+    if not config_info:
+        return jsonify({'success': False, 'error': 'Config not found'}), 404
+
+    try:
+        body = reference_config_body(config_info['url'])
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    parsed = parse_reference_config(body)
+    position = parsed['index'].get(request.args.get('section', ''))
+    if position is None:
+        return jsonify({'success': False, 'error': 'Section not found'}), 404
+
+    section = parsed['sections'][position]
+    lines = body.decode('utf-8').splitlines()
+    return jsonify({
+        'success': True,
+        'section': {
+            **section,
+            'text': '\n'.join(lines[section['start_line'] - 1:section['end_line']]),
+        },
+    })
+
+@app.route('/api/reference-config/diff', methods=['POST'])
+def diff_reference_config():
+    """Diff the config generated for body['options'] against the reference named by body['reference']"""
+    def invalid():
+        return jsonify({
+            'success': False,
+            'error': 'Expected {"options": {...}, "reference": {"printer": "...", "board": "...", "revision": "..."}}'
+        }), 400
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return invalid()
+    reference_args = data.get('reference') or {}
+    options = data.get('options') or {}
+    if not isinstance(reference_args, dict) or not isinstance(options, dict):
+        return invalid()
+    if not all(isinstance(reference_args.get(name, ''), str) for name in ('printer', 'board', 'revision')):
+        return invalid()
+    config_info = requested_reference_config(reference_args)
+    if not config_info:
+        return jsonify({'success': False, 'error': 'Config not found'}), 404
+
+    try:
+        reference = parse_reference_config(reference_config_body(config_info['url']))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    config_content, metadata = get_generated_config(resolve_generate_options(options))
+
+    key = (metadata['content_hash'], reference['content_hash'])
+    diff = reference_diff_cache.get(key)
+    if diff is None:
+        # Parsed outside the lru_cache: the diff cache already covers repeats and
+        # generated configs would only evict reference bodies
+        generated = parse_reference_config.__wrapped__(config_content.encode('utf-8'))
+        diff = diff_parsed_configs(reference, generated)
+        reference_diff_cache.set(key, diff)
+    return jsonify({
+        'success': True,
+        'reference': config_info['name'],
+        'generated_hash': metadata['content_hash'],
+        'reference_hash': reference['content_hash'],
+        **diff,
+    })
+
 def generate_xy_driver_config(axis, main_board, run_current):
     """Generate X/Y stepper driver configuration (TMC5160 for Leviathan, TMC2209 for others)"""
-    axis_pins = main_board['stepper_pins'][axis]
-    
     # Check if this board uses TMC5160 for XY (Leviathan)
-    if main_board.get('xy_driver_type') == 'tmc5160':
-        spi_bus = main_board.get('xy_spi_bus', 'spi4')
-        return f"""[tmc5160 stepper_{axis}]
-spi_bus: {spi_bus}
-cs_pin: {axis_pins['cs']}
-interpolate: false
-run_current: {run_current}
-sense_resistor: 0.075
-stealthchop_threshold: 0"""
-    else:
-        # Standard TMC2209
-        return f"""[tmc2209 stepper_{axis}]
-uart_pin: {axis_pins['uart']}
-interpolate: false
-run_current: {run_current}
-sense_resistor: 0.110
-stealthchop_threshold: 0"""
-
-def generate_comprehensive_cfg(printer, printer_size, main_board, toolhead_board, motor_config, probe, printer_type, print_start_type='standard', extruder_config=None):
-    if extruder_config is None:
-        extruder_config = EXTRUDERS['g2e_9t']  # Default to G2E 9:1
-    
-    bed_x, bed_y, bed_z = printer_size['bed_size']
-    x_current = motor_config['x']['current']
-    y_current = motor_config['y']['current']
-    z_current = motor_config['z']['current']
-    e_current = extruder_config['default_motor_current']
-    
-    probe_section = generate_probe_section(probe, bed_x, bed_y)
-    z_section = generate_z_section(printer_type, bed_x, bed_y, bed_z, z_current, main_board)
-    
-    # Check if toolhead uses CAN bus
-    is_canbus = toolhead_board.get('connection') == 'canbus'
-    
+    driver = 'tmc5160' if main_board.get('xy_driver_type') == 'tmc5160' else 'tmc2209'
+    return render_cfg_template(
+        f'xy_driver_{driver}.cfg',
+        axis=axis,
+        axis_pins=main_board['stepper_pins'][axis],
+        spi_bus=main_board.get('xy_spi_bus', 'spi4'),
+        run_current=run_current,
+    )
+
+# Section renderers are memoized on exactly the inputs they read, so a new option
+# combination mostly reuses fragments rendered for its neighbours. The option
+# space is small enough that the caches are left unbounded.
+SECTION_RENDERERS = []
+
+def _section_renderer(func):
+    """Memoize a config section renderer on its (hashable) arguments"""
+    cached = functools.lru_cache(maxsize=None)(func)
+    SECTION_RENDERERS.append(cached)
+    return cached
+
+def section_cache_stats():
+    """Hit/miss counters for every memoized section renderer"""
+    return {
+        renderer.__name__.lstrip('_'): renderer.cache_info()._asdict()
+        for renderer in SECTION_RENDERERS
+    }
+
+def clear_section_caches():
+    for renderer in SECTION_RENDERERS:
+        renderer.cache_clear()
+
+def warm_section_caches():
+    """Render every section fragment the catalogs allow (about 150 in total)"""
+    for options in iter_generate_options():
+        for _ in iter_config_sections(options):
+            pass
+
+def iter_config_sections(options):
+    """Yield the printer.cfg for resolved options section by section"""
+    bed_x, bed_y, bed_z = PRINTERS[options.printer]['sizes'][options.size]['bed_size']
+    motor_config = MOTORS[options.motors]
+
+    yield _header_section(options.printer, options.size, options.main_board)
+    yield _toolhead_mcu_section(options.toolhead_board)
+    yield _xy_section(options.main_board, bed_x, bed_y, motor_config['x']['current'], motor_config['y']['current'])
+    yield _z_section(options.printer, bed_x, bed_y, bed_z, motor_config['z']['current'], options.main_board)
+    yield _extruder_section(options.toolhead_board, options.extruder)
+    yield _bed_heater_section(options.main_board)
+    yield _probe_section(options.probe, bed_x, bed_y)
+    yield _fan_section(options.toolhead_board, options.main_board)
+    yield _homing_section(options.printer, bed_x, bed_y)
+    yield _macro_section(options.printer, bed_x, bed_y, options.print_start)
+    yield _accelerometer_section(options.toolhead_board, bed_x, bed_y)
+    if TOOLHEAD_BOARDS[options.toolhead_board].get('connection') == 'canbus':
+        yield _canbus_notes_section()
+
+def generate_comprehensive_cfg(options):
+    """Assemble the full printer.cfg for resolved options"""
+    return ''.join(iter_config_sections(options))
+
+# Section templates end at their last line of content; the blank lines that
+# separate them in printer.cfg are added here.
+
+@_section_renderer
+def _header_section(printer_type, size, main_board_id):
+    printer = PRINTERS[printer_type]
+    return render_cfg_template(
+        'header.cfg',
+        printer=printer,
+        printer_size=printer['sizes'][size],
+        main_board=MAIN_BOARDS[main_board_id],
+        printer_type=printer_type,
+    ) + '\n\n'
+
+@_section_renderer
+def _toolhead_mcu_section(toolhead_board_id):
+    toolhead_board = TOOLHEAD_BOARDS[toolhead_board_id]
     # Generate toolhead MCU section based on connection type
-    if is_canbus:
-        toolhead_mcu_section = f"""[mcu toolhead]
-##  For CAN bus toolheads, find UUID with: python3 ~/klipper/scripts/canbus_query.py can0
-canbus_uuid: {toolhead_board.get('canbus_uuid', 'update_me')}
-# canbus_interface: can0
-restart_method: command"""
-    else:
-        toolhead_mcu_section = f"""[mcu toolhead]
-##  Obtain definition by "ls -l /dev/serial/by-id/" then unplug to verify
-serial: {toolhead_board['serial_port']}
-restart_method: command"""
-    
-    # Generate leveling section based on printer type
+    if toolhead_board.get('connection') == 'canbus':
+        return render_cfg_template('toolhead_mcu_canbus.cfg', toolhead_board=toolhead_board) + '\n\n'
+    return render_cfg_template('toolhead_mcu_serial.cfg', toolhead_board=toolhead_board) + '\n\n'
+
+@_section_renderer
+def _xy_section(main_board_id, bed_x, bed_y, x_current, y_current):
+    return render_cfg_template(
+        'xy_steppers.cfg',
+        main_board=MAIN_BOARDS[main_board_id],
+        bed_x=bed_x,
+        bed_y=bed_y,
+        x_driver=_xy_driver_section('x', main_board_id, x_current),
+        y_driver=_xy_driver_section('y', main_board_id, y_current),
+    ) + '\n\n'
+
+@_section_renderer
+def _xy_driver_section(axis, main_board_id, run_current):
+    return generate_xy_driver_config(axis, MAIN_BOARDS[main_board_id], run_current)
+
+@_section_renderer
+def _z_section(printer_type, bed_x, bed_y, bed_z, z_current, main_board_id):
+    return generate_z_section(printer_type, bed_x, bed_y, bed_z, z_current, MAIN_BOARDS[main_board_id]) + '\n\n'
+
+@_section_renderer
+def _extruder_section(toolhead_board_id, extruder_id):
+    extruder_config = EXTRUDERS[extruder_id]
+    return render_cfg_template(
+        'extruder.cfg',
+        toolhead_board=TOOLHEAD_BOARDS[toolhead_board_id],
+        extruder_config=extruder_config,
+        e_current=extruder_config['default_motor_current'],
+    ) + '\n\n\n'
+
+@_section_renderer
+def _bed_heater_section(main_board_id):
+    return render_cfg_template('bed_heater.cfg', main_board=MAIN_BOARDS[main_board_id]) + '\n\n'
+
+@_section_renderer
+def _probe_section(probe_id, bed_x, bed_y):
+    probe_section = generate_probe_section(PROBES[probe_id], bed_x, bed_y)
+    return render_cfg_template('probe_section.cfg', probe_section=probe_section) + '\n\n'
+
+@_section_renderer
+def _fan_section(toolhead_board_id, main_board_id):
+    return render_cfg_template(
+        'fans.cfg',
+        toolhead_board=TOOLHEAD_BOARDS[toolhead_board_id],
+        main_board=MAIN_BOARDS[main_board_id],
+    ) + '\n\n'
+
+@_section_renderer
+def _homing_section(printer_type, bed_x, bed_y):
+    return render_cfg_template(
+        'homing.cfg',
+        bed_x=bed_x,
+        bed_y=bed_y,
+        leveling_section=generate_leveling_section(printer_type, bed_x, bed_y),
+    ) + '\n'
+
+@_section_renderer
+def _macro_section(printer_type, bed_x, bed_y, print_start_type):
+    # Add printer-specific macros based on print start type
+    if printer_type == 'voron2.4':
+        return generate_voron24_macros(bed_x, bed_y, print_start_type)
+    return generate_trident_macros(bed_x, bed_y, print_start_type)
+
+@_section_renderer
+def _accelerometer_section(toolhead_board_id, bed_x, bed_y):
+    # Add accelerometer configuration if toolhead has one
+    toolhead_board = TOOLHEAD_BOARDS[toolhead_board_id]
+    if 'accelerometer_pins' not in toolhead_board:
+        return ''
+    return render_cfg_template(
+        'accelerometer.cfg',
+        accel=toolhead_board['accelerometer_pins'],
+        bed_x=bed_x,
+        bed_y=bed_y,
+    ) + '\n'
+
+@_section_renderer
+def _canbus_notes_section():
+    # Add CAN bus notes if using CAN toolhead
+    return render_cfg_template('canbus_notes.cfg') + '\n'
+
+def generate_leveling_section(printer_type, bed_x, bed_y):
+    """Generate the QGL (Voron 2.4) or Z tilt (Trident) leveling section"""
     if printer_type == 'voron2.4':
         # Calculate gantry corners and probe points based on bed size
         if bed_x == 250:
@@ -719,920 +2422,212 @@ restart_method: command"""
             gantry_corners = "    -60,-10\n    360,310"
             probe_points = "    50,25\n    50,255\n    255,255\n    255,25"
         
-        leveling_section = f"""##  Use QUAD_GANTRY_LEVEL to level a gantry.
-##  Min & Max gantry corners - measure from nozzle at MIN (0,0) and 
-##  MAX ({bed_x}, {bed_y}) to respective belt positions
-[quad_gantry_level]
-gantry_corners:
-{gantry_corners}
-##  Probe points
-points:
-{probe_points}
-speed: 100
-horizontal_move_z: 10
-retries: 5
-retry_tolerance: 0.0075
-max_adjust: 10"""
+        return render_cfg_template(
+            'leveling_quad_gantry.cfg',
+            bed_x=bed_x,
+            bed_y=bed_y,
+            gantry_corners=gantry_corners,
+            probe_points=probe_points,
+        )
     else:  # Trident
-        leveling_section = f"""##  Use Z_TILT_ADJUST to level a bed with independently controlled Z motors.
-[z_tilt]
-##--------------------------------------------------------------------
-z_positions:
-    -50, 18
-    {bed_x / 2}, {bed_y + 50}
-    {bed_x + 50}, 18
-points:
-    30, 30
-    {bed_x / 2}, {bed_y - 30}
-    {bed_x - 30}, 30
-##--------------------------------------------------------------------
-speed: 100
-horizontal_move_z: 10
-retries: 5
-retry_tolerance: 0.0075
-
-# Bed Screw Positions (for manual bed tramming assistance)
-[bed_screws]
-screw1: 30, 30
-screw1_name: Front Left
-screw2: {bed_x - 30}, 30
-screw2_name: Front Right
-screw3: {bed_x - 30}, {bed_y - 30}
-screw3_name: Back Right
-screw4: 30, {bed_y - 30}
-screw4_name: Back Left
-speed: 100
-screw_thread: CW-M4"""
-    
-    config = f"""# This file contains common pin mappings for the {main_board['name']}
-# To use this config, the firmware should be compiled for the {main_board['mcu'].upper()}
-# Enable "extra low-level configuration options" and select the "12MHz crystal" as clock reference
-
-# See docs/Config_Reference.md for a description of parameters.
-
-## {printer['name']} {printer_size['name']} {main_board['name']} Config
-
-## *** THINGS TO CHANGE/CHECK: ***
-## MCU paths                            [mcu] section
-## Thermistor types                     [extruder] and [heater_bed] sections - See https://www.klipper3d.org/Config_Reference.html#common-thermistors for common thermistor types
-## Z Endstop Switch location            [safe_z_home] section
-## Homing end position                  [gcode_macro G32] section
-## Z Endstop Switch  offset for Z0      [stepper_z] section
-## Probe points                         [{"quad_gantry_level" if printer_type == "voron2.4" else "z_tilt"}] section
-## Min & Max gantry corner positions    [{"quad_gantry_level" if printer_type == "voron2.4" else "z_tilt"}] section
-## PID tune                             [extruder] and [heater_bed] sections
-## Probe pin                            [probe] section
-## Fine tune E steps                    [extruder] section
-
-[mcu]
-##  Obtain definition by "ls -l /dev/serial/by-id/" then unplug to verify
-##--------------------------------------------------------------------
-serial: {main_board['serial_port']}
-restart_method: command
-##--------------------------------------------------------------------
-
-{toolhead_mcu_section}
-
-[printer]
-kinematics: corexy
-max_velocity: 300  
-max_accel: 10000
-max_z_velocity: 30
-max_z_accel: 350
-square_corner_velocity: 5.0
-
-#####################################################################
-#   X/Y Stepper Settings
-#####################################################################
-
-##  B Stepper - Left (X)
-##  Connected to Motor Port
-##  Endstop connected to X-ENDSTOP
-[stepper_x]
-step_pin: {main_board['stepper_pins']['x']['step']}
-dir_pin: {main_board['stepper_pins']['x']['dir']}
-enable_pin: !{main_board['stepper_pins']['x']['enable']}
-rotation_distance: 40
-microsteps: 16
-full_steps_per_rotation: 200  #set to 400 for 0.9 degree stepper
-endstop_pin: {main_board['endstop_pins']['x']}
-position_min: 0
-position_endstop: {bed_x}
-position_max: {bed_x}
-homing_speed: 100
-homing_retract_dist: 5
-homing_positive_dir: true
-
-##  X Driver Configuration
-{generate_xy_driver_config('x', main_board, x_current)}
-
-##  A Stepper - Right (Y)
-##  Connected to Motor Port
-##  Endstop connected to Y-ENDSTOP
-[stepper_y]
-step_pin: {main_board['stepper_pins']['y']['step']}
-dir_pin: {main_board['stepper_pins']['y']['dir']}
-enable_pin: !{main_board['stepper_pins']['y']['enable']}
-rotation_distance: 40
-microsteps: 16
-full_steps_per_rotation: 200  #set to 400 for 0.9 degree stepper
-endstop_pin: {main_board['endstop_pins']['y']}
-position_min: 0
-position_endstop: {bed_y}
-position_max: {bed_y}
-homing_speed: 100
-homing_retract_dist: 5
-homing_positive_dir: true
-
-##  Y Driver Configuration
-{generate_xy_driver_config('y', main_board, y_current)}
- 
-#####################################################################
-#   Z Stepper Settings
-#####################################################################
-
-{z_section}
-
-#####################################################################
-#   Extruder
-#####################################################################
-
-##  Connected to Toolhead
-##  Heater - HE0
-##  Thermistor - TH0
-[extruder]
-step_pin: toolhead:{toolhead_board['stepper_pins']['step']}
-dir_pin: toolhead:{toolhead_board['stepper_pins']['dir']}
-enable_pin: !toolhead:{toolhead_board['stepper_pins']['enable']}
-##  Update value below when you perform extruder calibration
-##  If you ask for 100mm of filament, but in reality it is 98mm:
-##  rotation_distance = <previous_rotation_distance> * <actual_extrude_distance> / 100
-rotation_distance: {extruder_config['rotation_distance']}
-##  Update Gear Ratio depending on your Extruder Type
-gear_ratio: {extruder_config['gear_ratio']}
-microsteps: 16
-full_steps_per_rotation: 200    #200 for 1.8 degree, 400 for 0.9 degree
-nozzle_diameter: {extruder_config['nozzle_diameter']}
-filament_diameter: {extruder_config['filament_diameter']}
-heater_pin: toolhead:{toolhead_board['heater_pin']}
-## Check what thermistor type you have. See https://www.klipper3d.org/Config_Reference.html#common-thermistors for common thermistor types.
-## Use "Generic 3950" for NTC 100k 3950 thermistors
-sensor_type: ATC Semitec 104NT-4-R025H42
-sensor_pin: toolhead:{toolhead_board['thermistor_pin']}
-min_temp: 0
-max_temp: 270
-max_power: 1.0
-min_extrude_temp: 170
-#control: pid
-#pid_kp = 26.213
-#pid_ki = 1.304
-#pid_kd = 131.721
-##  Try to keep pressure_advance below 1.0
-pressure_advance: {extruder_config['pressure_advance']}
-##  Default is 0.040, leave stock
-pressure_advance_smooth_time: {extruder_config['pressure_advance_smooth_time']}
-
-##  Connected to Toolhead
-[tmc2209 extruder]
-uart_pin: toolhead:{toolhead_board['stepper_pins']['uart']}
-interpolate: false
-run_current: {e_current}
-sense_resistor: 0.110
-stealthchop_threshold: 0
-
-
-#####################################################################
-#   Bed Heater
-#####################################################################
-
-[heater_bed]
-##  SSR Pin - HEATBED
-##  Thermistor - TB
-heater_pin: {main_board['heater_pins']['bed']}
-## Check what thermistor type you have. See https://www.klipper3d.org/Config_Reference.html#common-thermistors for common thermistor types.
-## Use "Generic 3950" for Keenovo heaters
-sensor_type: ATC Semitec 104NT-4-R025H42
-sensor_pin: TB
-##  Adjust Max Power so your heater doesn't warp your bed. Rule of thumb is 0.4 watts / cm^2 .
-max_power: 1.0
-min_temp: 0
-max_temp: 120
-#control: pid
-#pid_kp: 58.437
-#pid_ki: 2.347
-#pid_kd: 363.769
-
-#####################################################################
-#   Probe
-#####################################################################
-
-{probe_section}
-
-#####################################################################
-#   Fan Control
-#####################################################################
-
-[fan]
-##  Print Cooling Fan - Part Cooling
-pin: toolhead:{toolhead_board['fan_pins']['part_cooling']}
-##tachometer_pin: 
-kick_start_time: 0.5
-##  Depending on your fan, you may need to increase this value
-##  if your fan will not start. Can change cycle_time (increase)
-##  if your fan is not able to slow down effectively
-off_below: 0.10
-
-[heater_fan hotend_fan]
-##  Hotend Fan
-pin: toolhead:{toolhead_board['fan_pins']['hotend']}
-##tachometer_pin: 
-max_power: 1.0
-kick_start_time: 0.5
-heater: extruder
-heater_temp: 50.0
-##  If you are experiencing back flow, you can reduce fan_speed
-#fan_speed: 1.0
-
-[temperature_fan controller_fan]
-##  Controller fan - Main Board
-pin: {main_board['fan_pins']['controller']}
-max_power: 1.0
-shutdown_speed: 0.0
-cycle_time: 0.010
-sensor: temperature_host
-control: watermark
-max_delta: 2.0
-min_temp: 0
-max_temp: 85
-target_temp: 50
-
-[temperature_sensor chamber_temp]
-## Chamber Temperature Sensor
-sensor_type: ATC Semitec 104NT-4-R025H42
-sensor_pin: TEMPERATURE_SENSOR_1
-min_temp: 0
-max_temp: 100
-gcode_id: chamber_th
-
-[temperature_sensor raspberry_pi]
-sensor_type: temperature_host
-min_temp: 0
-max_temp: 100
-
-[temperature_sensor mcu_temp]
-sensor_type: temperature_mcu
-min_temp: 0
-max_temp: 100
-
-#####################################################################
-#   LED Control
-#####################################################################
-
-## Chamber Lighting (Optional)
-## Connected to LED port
-[output_pin caselight]
-pin: LED_PIN
-pwm:true
-hardware_pwm: False
-value: 0.20 #startup value
-shutdown_value: 0
-value: 0.4
-cycle_time: 0.00025
-
-#####################################################################
-#   Homing and Gantry Adjustment Routines
-#####################################################################
-
-[idle_timeout]
-timeout: 1800
-
-[safe_z_home]
-##  XY Location of the Z Endstop Switch
-##  Update to the XY coordinates of your endstop pin
-home_xy_position:{bed_x/2},{bed_y/2}
-speed:100
-z_hop:10
-
-{leveling_section}
-
-[bed_mesh]
-speed: 300
-horizontal_move_z: 10
-mesh_min: 40, 40
-mesh_max: {bed_x-40},{bed_y-40}
-fade_start: 0.6
-fade_end: 10.0
-probe_count: 7,7 # Values should be odd, so one point is directly at bed center
-algorithm: bicubic
-
-#####################################################################
-#   Macros
-#####################################################################
-
-[gcode_macro G28]
-rename_existing: G28.0
-gcode:
-    G28.0 {{rawparams}}
-    
-[gcode_macro M109]
-rename_existing: M109.0
-gcode:
-    M109.0 {{rawparams}}
-    
-[gcode_macro M190]
-rename_existing: M190.0
-gcode:
-    M190.0 {{rawparams}}
-
-[gcode_macro CANCEL_PRINT]
-rename_existing: CANCEL_PRINT.0
-gcode:
-    G91
-    G1 Z5 E-5 F3000
-    G90
-    TURN_OFF_HEATERS
-    M84
-    CANCEL_PRINT.0
-
-[gcode_macro PAUSE]
-rename_existing: PAUSE.0
-gcode:
-    PAUSE.0
-    G91
-    G1 E-5 F3000
-    G1 Z10 F3000
-    G90
-
-[gcode_macro RESUME]
-rename_existing: RESUME.0
-gcode:
-    G91
-    G1 E5 F3000
-    G90
-    RESUME.0
-
-## Printer-Specific Setup and Macros
-"""
-    
-    # Add printer-specific macros based on print start type
-    if printer_type == 'voron2.4':
-        config += generate_voron24_macros(bed_x, bed_y, print_start_type)
-    else:
-        config += generate_trident_macros(bed_x, bed_y, print_start_type)
-    
-    # Add accelerometer configuration if toolhead has one
-    if 'accelerometer_pins' in toolhead_board:
-        accel = toolhead_board['accelerometer_pins']
-        config += f"""
-## Onboard Accelerometer (for Input Shaping)
-[adxl345]
-cs_pin: toolhead:{accel['cs']}
-spi_software_sclk_pin: toolhead:{accel['clk']}
-spi_software_mosi_pin: toolhead:{accel['mosi']}
-spi_software_miso_pin: toolhead:{accel['miso']}
-axes_map: x,y,z  # May need adjustment based on mounting orientation
-
-[resonance_tester]
-accel_chip: adxl345
-probe_points:
-    {bed_x / 2}, {bed_y / 2}, 20  # Center of bed, 20mm above
-"""
-    
-    # Add CAN bus notes if using CAN toolhead
-    if is_canbus:
-        config += """
-# ============================================================================
-# CAN BUS SETUP NOTES
-# ============================================================================
-# 1. Flash your main board with CAN support enabled:
-#    - Enable CAN bus in make menuconfig
-#    - Use 'can0' interface (or your chosen interface)
-#
-# 2. Flash your toolhead board (EBB SB2209/EBB36):
-#    - Use Katapult/CanBoot for easy updates
-#    - Enable CAN in the toolhead firmware
-#
-# 3. Find your toolhead UUID:
-#    - Run: python3 ~/klipper/scripts/canbus_query.py can0
-#    - Update the canbus_uuid above with the correct value
-#
-# 4. Wiring:
-#    - Connect CAN_H and CAN_L between main board and toolhead
-#    - Ensure 120Ω termination resistor is present (usually on toolhead)
-#
-# For more info: https://www.klipper3d.org/CANBUS.html
-# ============================================================================
-"""
-    
-    return config
+        return render_cfg_template('leveling_z_tilt.cfg', bed_x=bed_x, bed_y=bed_y)
 
 def generate_voron24_macros(bed_x, bed_y, print_start_type='standard'):
     """Generate Voron 2.4 specific macros"""
-    
     if print_start_type == 'better':
         # Better Print Start Macro (Ellis style)
-        return f"""# Voron 2.4 Specific Setup
-[gcode_macro G32]
-description: Quad gantry level
-gcode:
-    BED_MESH_CLEAR
-    QUAD_GANTRY_LEVEL
-    G28
-    
-# Better Print Start Macro - Based on Ellis' macro
-[gcode_macro PRINT_START]
-description: Enhanced print start with heat soak and adaptive bed mesh
-gcode:
-    # Parameters
-    {{% set BED_TEMP = params.BED|default(60)|float %}}
-    {{% set EXTRUDER_TEMP = params.EXTRUDER|default(200)|float %}}
-    {{% set CHAMBER_TEMP = params.CHAMBER|default(0)|float %}}
-    {{% set SOAK_TIME = params.SOAK|default(0)|int %}}
-    {{% set ADAPTIVE_MESH = params.MESH|default(1)|int %}}
-    
-    # Initial status
-    M104 S150                          # Preheat nozzle to 150C
-    M140 S{{{{BED_TEMP}}}}               # Set bed temp
-    
-    # Home all axes
-    G28
-    
-    # Quad gantry level
-    QUAD_GANTRY_LEVEL
-    G28 Z
-    
-    # Park at center for chamber heating
-    G1 X{{{bed_x / 2}}} Y{{{bed_y / 2}}} F3000
-    G1 Z50 F3000
-    
-    # Chamber heating (if specified)
-    {{% if CHAMBER_TEMP > 0 %}}
-        M190 S{{{{BED_TEMP}}}}           # Wait for bed
-        # Wait for chamber temp or soak time
-        {{% if SOAK_TIME > 0 %}}
-            G4 P{{{{SOAK_TIME * 60000}}}}  # Wait in ms
-        {{% endif %}}
-    {{% else %}}
-        M190 S{{{{BED_TEMP}}}}           # Wait for bed
-    {{% endif %}}
-    
-    # Adaptive bed mesh (if enabled)
-    {{% if ADAPTIVE_MESH > 0 %}}
-        BED_MESH_CALIBRATE
-    {{% else %}}
-        BED_MESH_PROFILE LOAD=default
-    {{% endif %}}
-    
-    # Final nozzle heat
-    M109 S{{{{EXTRUDER_TEMP}}}}
-    
-    # Smart priming line
-    G1 X20 Y20 F3000
-    G1 Z0.2 F3000
-    G1 X50 Y20 E15 F1500
-    G1 X80 Y20 E15 F1500
-    G1 X100 Y20 E10 F1500
-    G1 Z2 F3000
-
-[gcode_macro PRINT_END]
-description: Enhanced print end with part cooling
-gcode:
-    # Save position
-    G91
-    G1 E-3 F3000                      # Small retract
-    
-    # Move away
-    G1 Z10 F3000
-    G90
-    G1 X{{{bed_x / 2}}} Y{{{bed_y - 50}}} F3000
-    
-    # Turn off heaters
-    M104 S0                           # Hotend off
-    M140 S0                           # Bed off
-    M106 S255                         # Full cooling
-    
-    # Wait for cooling
-    G4 P30000                         # 30s cooling
-    M106 S0                           # Fans off
-    M84                               # Motors off
-
-[gcode_macro M600]
-description: Filament change with parking
-gcode:
-    PAUSE
-    G91
-    G1 E-20 F3000                     # Big retract
-    G1 Z50 F3000                      # Move up
-    G90
-    G1 X{{{bed_x / 2}}} Y20 F3000     # Park front
-    M109 S200                         # Wait for temp
-    
-[gcode_macro LOAD_FILAMENT]
-description: Load filament with purge
-gcode:
-    M109 S200
-    G91
-    G1 E50 F300
-    G1 E10 F150
-    G90
-    
-[gcode_macro UNLOAD_FILAMENT]
-description: Unload filament
-gcode:
-    M109 S200
-    G91
-    G1 E10 F150
-    G1 E-60 F3000
-    G90
-"""
-    else:
-        # Standard LDO Kit Print Start
-        return f"""# Voron 2.4 Specific Setup
-[gcode_macro G32]
-description: Quad gantry level
-gcode:
-    BED_MESH_CLEAR
-    QUAD_GANTRY_LEVEL
-    G28
-
-[gcode_macro PRINT_START]
-description: Standard print start sequence
-gcode:
-    {{% set BED_TEMP = params.BED|default(60)|float %}}
-    {{% set EXTRUDER_TEMP = params.EXTRUDER|default(200)|float %}}
-    G28
-    QUAD_GANTRY_LEVEL
-    G28 Z
-    M190 S{{{{BED_TEMP}}}}
-    M109 S{{{{EXTRUDER_TEMP}}}}
-    BED_MESH_PROFILE LOAD=default
-    G1 X20 Y20 F3000
-    G1 Z0.2 F3000
-    G1 X50 Y20 E15 F1500
-    G1 X80 Y20 E15 F1500
-    G1 X100 Y20 E10 F1500
-    G1 Z2 F3000
-
-[gcode_macro PRINT_END]
-description: End print sequence
-gcode:
-    G91
-    G1 E-5 F3000
-    G1 Z10 F3000
-    G90
-    G1 X{{{bed_x / 2}}} Y{{{bed_y - 50}}} F3000
-    TURN_OFF_HEATERS
-    M84
-"""
+        return render_cfg_template('macros_voron24_better.cfg', bed_x=bed_x, bed_y=bed_y) + '\n'
+    # Standard LDO Kit Print Start
+    return render_cfg_template('macros_voron24.cfg', bed_x=bed_x, bed_y=bed_y) + '\n'
 
 def generate_trident_macros(bed_x, bed_y, print_start_type='standard'):
     """Generate Trident specific macros"""
-    
     if print_start_type == 'better':
         # Better Print Start Macro for Trident
-        return f"""# Trident Specific Setup
-[gcode_macro G32]
-description: Z tilt calibration
-gcode:
-    BED_MESH_CLEAR
-    Z_TILT_ADJUST
-    G28
-    
-# Better Print Start Macro for Trident
-[gcode_macro PRINT_START]
-description: Enhanced print start with heat soak and adaptive bed mesh
-gcode:
-    # Parameters
-    {{% set BED_TEMP = params.BED|default(60)|float %}}
-    {{% set EXTRUDER_TEMP = params.EXTRUDER|default(200)|float %}}
-    {{% set CHAMBER_TEMP = params.CHAMBER|default(0)|float %}}
-    {{% set SOAK_TIME = params.SOAK|default(0)|int %}}
-    {{% set ADAPTIVE_MESH = params.MESH|default(1)|int %}}
-    
-    # Initial status
-    M104 S150                          # Preheat nozzle to 150C
-    M140 S{{{{BED_TEMP}}}}               # Set bed temp
-    
-    # Home all axes
-    G28
-    
-    # Z tilt adjust
-    Z_TILT_ADJUST
-    G28 Z
-    
-    # Park at center for chamber heating
-    G1 X{{{bed_x / 2}}} Y{{{bed_y / 2}}} F3000
-    G1 Z50 F3000
-    
-    # Chamber heating (if specified)
-    {{% if CHAMBER_TEMP > 0 %}}
-        M190 S{{{{BED_TEMP}}}}           # Wait for bed
-        # Wait for chamber temp or soak time
-        {{% if SOAK_TIME > 0 %}}
-            G4 P{{{{SOAK_TIME * 60000}}}}  # Wait in ms
-        {{% endif %}}
-    {{% else %}}
-        M190 S{{{{BED_TEMP}}}}           # Wait for bed
-    {{% endif %}}
-    
-    # Adaptive bed mesh (if enabled)
-    {{% if ADAPTIVE_MESH > 0 %}}
-        BED_MESH_CALIBRATE
-    {{% else %}}
-        BED_MESH_PROFILE LOAD=default
-    {{% endif %}}
-    
-    # Final nozzle heat
-    M109 S{{{{EXTRUDER_TEMP}}}}
-    
-    # Smart priming line
-    G1 X20 Y20 F3000
-    G1 Z0.2 F3000
-    G1 X50 Y20 E15 F1500
-    G1 X80 Y20 E15 F1500
-    G1 X100 Y20 E10 F1500
-    G1 Z2 F3000
-
-[gcode_macro PRINT_END]
-description: Enhanced print end with part cooling
-gcode:
-    # Save position
-    G91
-    G1 E-3 F3000                      # Small retract
-    
-    # Move away
-    G1 Z10 F3000
-    G90
-    G1 X{{{bed_x / 2}}} Y30 F3000
-    
-    # Turn off heaters
-    M104 S0                           # Hotend off
-    M140 S0                           # Bed off
-    M106 S255                         # Full cooling
-    
-    # Wait for cooling
-    G4 P30000                         # 30s cooling
-    M106 S0                           # Fans off
-    M84                               # Motors off
-
-[gcode_macro M600]
-description: Filament change with parking
-gcode:
-    PAUSE
-    G91
-    G1 E-20 F3000                     # Big retract
-    G1 Z50 F3000                      # Move up
-    G90
-    G1 X{{{bed_x / 2}}} Y20 F3000     # Park front
-    M109 S200                         # Wait for temp
-    
-[gcode_macro LOAD_FILAMENT]
-description: Load filament with purge
-gcode:
-    M109 S200
-    G91
-    G1 E50 F300
-    G1 E10 F150
-    G90
-    
-[gcode_macro UNLOAD_FILAMENT]
-description: Unload filament
-gcode:
-    M109 S200
-    G91
-    G1 E10 F150
-    G1 E-60 F3000
-    G90
-"""
-    else:
-        # Standard LDO Kit Print Start for Trident
-        return f"""# Trident Specific Setup
-[gcode_macro G32]
-description: Z tilt calibration
-gcode:
-    BED_MESH_CLEAR
-    Z_TILT_ADJUST
-    G28
-
-[gcode_macro PRINT_START]
-description: Standard print start sequence
-gcode:
-    {{% set BED_TEMP = params.BED|default(60)|float %}}
-    {{% set EXTRUDER_TEMP = params.EXTRUDER|default(200)|float %}}
-    G28
-    Z_TILT_ADJUST
-    G28 Z
-    M190 S{{{{BED_TEMP}}}}
-    M109 S{{{{EXTRUDER_TEMP}}}}
-    BED_MESH_PROFILE LOAD=default
-    G1 X20 Y20 F3000
-    G1 Z0.2 F3000
-    G1 X50 Y20 E15 F1500
-    G1 X80 Y20 E15 F1500
-    G1 X100 Y20 E10 F1500
-    G1 Z2 F3000
-
-[gcode_macro PRINT_END]
-description: End print sequence
-gcode:
-    G91
-    G1 E-5 F3000
-    G1 Z10 F3000
-    G90
-    G1 X{{{bed_x / 2}}} Y30 F3000
-    TURN_OFF_HEATERS
-    M84
-"""
+        return render_cfg_template('macros_trident_better.cfg', bed_x=bed_x, bed_y=bed_y) + '\n'
+    # Standard LDO Kit Print Start for Trident
+    return render_cfg_template('macros_trident.cfg', bed_x=bed_x, bed_y=bed_y) + '\n'
 
 def generate_z_section(printer_type, bed_x, bed_y, bed_z, z_current, main_board):
-    z_pins = main_board['stepper_pins']['z']
-    z1_pins = main_board['stepper_pins']['z1']
-    z2_pins = main_board['stepper_pins']['z2']
-    
-    # Generate Z stepper config
-    z_stepper = f"""[stepper_z]
-step_pin: {z_pins['step']}
-dir_pin: {z_pins['dir']}
-enable_pin: !{z_pins['enable']}
-microsteps: 16
-rotation_distance: 40
-endstop_pin: probe:z_virtual_endstop
-position_max: {bed_z}
-position_min: -5
-homing_speed: 15
-second_homing_speed: 3
-
-[tmc2209 stepper_z]
-uart_pin: {z_pins['uart']}
-run_current: {z_current}
-sense_resistor: 0.110
-stealthchop_threshold: 0
-interpolate: true"""
-    
-    # Generate Z1 stepper config
-    z1_stepper = f"""
-[stepper_z1]
-step_pin: {z1_pins['step']}
-dir_pin: {z1_pins['dir']}
-enable_pin: !{z1_pins['enable']}
-microsteps: 16
-rotation_distance: 40
-
-[tmc2209 stepper_z1]
-uart_pin: {z1_pins['uart']}
-run_current: {z_current}
-sense_resistor: 0.110
-stealthchop_threshold: 0
-interpolate: true"""
-    
-    # Generate Z2 stepper config
-    z2_stepper = f"""
-[stepper_z2]
-step_pin: {z2_pins['step']}
-dir_pin: {z2_pins['dir']}
-enable_pin: !{z2_pins['enable']}
-microsteps: 16
-rotation_distance: 40
-
-[tmc2209 stepper_z2]
-uart_pin: {z2_pins['uart']}
-run_current: {z_current}
-sense_resistor: 0.110
-stealthchop_threshold: 0
-interpolate: true"""
-    
-    if printer_type == 'trident':
-        # Trident has only 3 Z steppers
-        leveling_section = f"""
-[z_tilt]
-z_positions:
-    -50, 18
-    {bed_x / 2}, {bed_y + 50}
-    {bed_x + 50}, 18
-points:
-    30, 30
-    {bed_x / 2}, {bed_y - 30}
-    {bed_x - 30}, 30
-speed: 100
-horizontal_move_z: 10
-retries: 5
-retry_tolerance: 0.0075"""
-        return z_stepper + z1_stepper + z2_stepper + leveling_section
-    else:
-        # Voron 2.4 has 4 Z steppers
-        z3_pins = main_board['stepper_pins']['z3']
-        z3_stepper = f"""
-[stepper_z3]
-step_pin: {z3_pins['step']}
-dir_pin: {z3_pins['dir']}
-enable_pin: !{z3_pins['enable']}
-microsteps: 16
-rotation_distance: 40
-
-[tmc2209 stepper_z3]
-uart_pin: {z3_pins['uart']}
-run_current: {z_current}
-sense_resistor: 0.110
-stealthchop_threshold: 0
-interpolate: true"""
-        leveling_section = f"""
-[quad_gantry_level]
-gantry_corners:
-    -60, -10
-    {bed_x + 60}, {bed_y + 10}
-points:
-    30, 30
-    30, {bed_y - 30}
-    {bed_x - 30}, {bed_y - 30}
-    {bed_x - 30}, 30
-speed: 100
-horizontal_move_z: 10
-max_adjust: 10
-retries: 5
-retry_tolerance: 0.0075"""
-        return z_stepper + z1_stepper + z2_stepper + z3_stepper + leveling_section
+    stepper_pins = main_board['stepper_pins']
+    # Trident has 3 Z steppers, Voron 2.4 has 4
+    template = 'z_trident.cfg' if printer_type == 'trident' else 'z_voron24.cfg'
+    return render_cfg_template(
+        template,
+        bed_x=bed_x,
+        bed_y=bed_y,
+        bed_z=bed_z,
+        z_current=z_current,
+        z_pins=stepper_pins['z'],
+        z1_pins=stepper_pins['z1'],
+        z2_pins=stepper_pins['z2'],
+        z3_pins=stepper_pins.get('z3'),
+    )
 
 def generate_probe_section(probe, bed_x, bed_y):
-    if probe['type'] == 'probe':
-        return f"""[probe]
-pin: {probe['pin']}
-x_offset: 0.0
-y_offset: 0.0
-#z_offset: 0.0  # Calibrate with PROBE_CALIBRATE
-speed: 3.0
-samples: 3
-samples_result: median
-sample_retract_dist: 3.0
-samples_tolerance: 0.006
-samples_tolerance_retries: 3
-
-[bed_mesh]
-speed: 150
-horizontal_move_z: 5
-mesh_min: 30, 30
-mesh_max: {bed_x - 30}, {bed_y - 30}
-probe_count: 7, 7
-algorithm: bicubic
-bicubic_tension: 0.2
-fade_start: 1.0
-fade_end: 10.0
-fade_target: 0
-split_delta_z: 0.01
-move_check_distance: 3.0
-mesh_pps: 2, 2
-zero_reference_position: {bed_x / 2}, {bed_y / 2}
-
-[safe_z_home]
-home_xy_position: {bed_x / 2}, {bed_y / 2}
-speed: 100
-z_hop: 10
-z_hop_speed: 15
-
-[gcode_macro PROBE_CALIBRATE]
-description: Calibrate probe z_offset
-rename_existing: PROBE_CALIBRATE.0
-gcode:
-    PROBE_CALIBRATE.0"""
-    else:
-        return f"""[beacon]
-serial: {probe['serial_port']}
-collision_homing: true
-collision_z_homing: true
-contact_max_hotend_temperature: 180
-home_xy_position: {bed_x / 2}, {bed_y / 2}
-home_z_hop: 5
-home_z_hop_speed: 15
-home_xy_speed: 100
-home_z_speed: 15
-calibration_method: touch
-sensor_mode: contact
-
-[bed_mesh]
-speed: 150
-horizontal_move_z: 5
-mesh_min: 30, 30
-mesh_max: {bed_x - 30}, {bed_y - 30}
-probe_count: 7, 7
-algorithm: bicubic
-bicubic_tension: 0.2
-fade_start: 1.0
-fade_end: 10.0
-fade_target: 0
-split_delta_z: 0.01
-move_check_distance: 3.0
-mesh_pps: 2, 2
-zero_reference_position: {bed_x / 2}, {bed_y / 2}
-
-[safe_z_home]
-home_xy_position: {bed_x / 2}, {bed_y / 2}
-speed: 100
-z_hop: 10
-z_hop_speed: 15
-
-[gcode_macro PROBE_CALIBRATE]
-description: Calibrate beacon probe
-gcode:
-    BEACON_CALIBRATE"""
+    template = 'probe.cfg' if probe['type'] == 'probe' else 'beacon.cfg'
+    return render_cfg_template(template, probe=probe, bed_x=bed_x, bed_y=bed_y)
+
+# Fill the section caches up front so no request pays for a template render
+warm_section_caches()
+
+def iter_reference_urls():
+    """Every upstream URL in LDO_REFERENCE_CONFIGS"""
+    for printer_configs in LDO_REFERENCE_CONFIGS.values():
+        for board_configs in printer_configs.values():
+            for config in board_configs.values():
+                yield config['url']
+
+REFERENCE_SNAPSHOT_FORMAT = 1
+
+class ReferenceSnapshot:
+    """Gzipped JSON snapshot of reference config bodies keyed by URL.
+
+    Layout: {format, version, created_at, entries: {url: {sha256, source,
+    content}}}. version is a hash over every entry, so two snapshots with the
+    same content share a version. Bodies are decompressed once at load.
+    """
+
+    def __init__(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            document = json.load(f)
+        if document.get('format') != REFERENCE_SNAPSHOT_FORMAT:
+            raise ValueError(f'unsupported snapshot format {document.get("format")!r}')
+        self.path = path
+        self.version = document['version']
+        self.created_at = document['created_at']
+        self.bodies = {url: entry['content'].encode('utf-8') for url, entry in document['entries'].items()}
+
+    def get(self, url):
+        return self.bodies.get(url)
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'created_at': self.created_at,
+            'entries': len(self.bodies),
+        }
+
+def reference_repo_path(url):
+    """Split a raw.githubusercontent.com URL into (repository, path within the checkout)"""
+    _, _owner, repo, _branch, *path = urlsplit(url).path.split('/')
+    return repo, '/'.join(path)
+
+def build_reference_snapshot(path, checkouts=None, client=None):
+    """Write a snapshot of every reference config, reading from local git
+    checkouts ({repository: directory}) where given and upstream otherwise."""
+    checkouts = checkouts or {}
+    # ttl=0 and no directory: always fetch, never reuse the serving cache
+    upstream = ReferenceCache(None, ttl=0, client=client or upstream_pool)
+    entries = {}
+    for url in iter_reference_urls():
+        repo, repo_path = reference_repo_path(url)
+        if repo in checkouts:
+            with open(os.path.join(checkouts[repo], *repo_path.split('/')), 'rb') as f:
+                body = f.read()
+            source = f'checkout:{repo}/{repo_path}'
+        else:
+            body = upstream.get(url)
+            source = url
+        entries[url] = {
+            'sha256': hashlib.sha256(body).hexdigest(),
+            'source': source,
+            'content': body.decode('utf-8'),
+        }
+
+    version = hashlib.sha256()
+    for url in sorted(entries):
+        version.update(f'{url}\0{entries[url]["sha256"]}\n'.encode('utf-8'))
+    document = {
+        'format': REFERENCE_SNAPSHOT_FORMAT,
+        'version': version.hexdigest()[:16],
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'entries': entries,
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=9) as f:
+        json.dump(document, f)
+    os.replace(tmp_path, path)
+    return document
+
+def load_reference_snapshot(path):
+    """Load the snapshot at path, or return None if it is missing or unreadable"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return ReferenceSnapshot(path)
+    except (OSError, ValueError, KeyError) as e:
+        app.logger.warning('Ignoring reference snapshot %s: %s', path, e)
+        return None
+
+reference_snapshot = load_reference_snapshot(app.config['REFERENCE_SNAPSHOT_PATH'])
+
+@app.cli.command('refresh-references')
+@click.option('--output', '-o', default=None, help='Snapshot path (defaults to REFERENCE_SNAPSHOT_PATH)')
+@click.option('--checkout', 'checkouts', multiple=True, metavar='REPO=DIR',
+              help='Read REPO (e.g. LDOVoron2) from a local git checkout instead of GitHub')
+def refresh_references_command(output, checkouts):
+    """Snapshot every LDO reference config for offline serving."""
+    path = output or app.config['REFERENCE_SNAPSHOT_PATH']
+    checkout_dirs = {}
+    for checkout in checkouts:
+        repo, sep, directory = checkout.partition('=')
+        if not sep:
+            raise click.BadParameter(f'expected REPO=DIR, got {checkout!r}', param_hint='--checkout')
+        checkout_dirs[repo] = directory
+    document = build_reference_snapshot(path, checkout_dirs)
+    click.echo(f'Wrote {len(document["entries"])} reference configs to {path} (version {document["version"]})')
+
+def start_reference_warmup():
+    """Start the reference prefetch for this process, if enabled"""
+    if not app.config['REFERENCE_PREFETCH']:
+        reference_warmup.ready.set()
+        return
+    reference_warmup.start(
+        reference_cache,
+        # References in the snapshot never go upstream
+        [url for url in iter_reference_urls() if reference_snapshot is None or reference_snapshot.get(url) is None],
+        app.config['REFERENCE_PREFETCH_CONCURRENCY'],
+        app.config['REFERENCE_PREFETCH_BUDGET'],
+    )
+
+# Without prefetch there is nothing to wait for, whichever way the app is served
+if not app.config['REFERENCE_PREFETCH']:
+    reference_warmup.ready.set()
+
+_started_pid = None
+_start_lock = threading.Lock()
+
+def create_app():
+    """Application factory for production servers.
+
+    Catalogs, templates, caches and the config pack are built when this
+    module is imported, so a pre-fork server with preload_app builds them once
+    and workers share them copy-on-write. Threads do not survive fork, so
+    per-process background work (the reference prefetch) starts here, once
+    per process; gunicorn.conf.py calls this from post_fork. Servers that
+    never call it (flask run, a bare gunicorn app:app) start it on the first
+    request instead.
+    """
+    global _started_pid
+    with _start_lock:
+        if _started_pid != os.getpid():
+            _started_pid = os.getpid()
+            start_reference_warmup()
+    return app
+
+@app.before_request
+def start_process_background_work():
+    if _started_pid != os.getpid():
+        create_app()
+
+@app.route('/api/ready', methods=['GET'])
+def get_ready():
+    """Readiness probe - 503 until the reference prefetch has finished or timed out"""
+    status = reference_warmup.status()
+    return jsonify({'success': True, **status}), 200 if status['ready'] else 503
 
 @app.route('/ldo-references')
 def ldo_references():
@@ -1641,4 +2636,5 @@ def ldo_references():
                          reference_configs=LDO_REFERENCE_CONFIGS)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=3000, debug=True)
+    # Development server; see gunicorn.conf.py for production
+    create_app().run(host='0.0.0.0', port=3000, debug=True)
@@ -0,0 +1,144 @@
+"""Generation benchmark over every combination the catalogs allow.
+
+Times generate_comprehensive_cfg directly and the full POST /api/generate
+request path through the Flask test client. Section fragments are cached
+(and all rendered at import), so each path is measured "cold", with the
+section caches cleared before every call, which is the real generation cost,
+and "warm", where a render only joins cached fragments. The request path is
+also measured "cached", the steady state with the generation cache filled.
+Peak allocation per call is measured in a separate tracemalloc pass so
+tracing overhead does not skew the latencies.
+
+    python benchmarks/bench_generate.py [--rounds 3] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+
+
+def direct_call(cold):
+    def call(options):
+        if cold:
+            app_module.clear_section_caches()
+        app_module.generate_comprehensive_cfg(options)
+    return call
+
+
+def request_call(client, clear_cache, cold=False):
+    def call(options):
+        if clear_cache:
+            app_module.generation_cache.clear()
+        if cold:
+            app_module.clear_section_caches()
+        response = client.post('/api/generate', json=options._asdict())
+        assert response.status_code == 200, response.status_code
+    return call
+
+
+def time_calls(call, options_list, rounds):
+    timings = []
+    start_all = time.perf_counter()
+    for _ in range(rounds):
+        for options in options_list:
+            start = time.perf_counter()
+            call(options)
+            timings.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - start_all
+    return timings, elapsed
+
+
+def peak_allocations(call, options_list):
+    peaks = []
+    tracemalloc.start()
+    try:
+        for options in options_list:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            call(options)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def summarize(call, options_list, rounds):
+    call(options_list[0])
+    timings, elapsed = time_calls(call, options_list, rounds)
+    peaks = peak_allocations(call, options_list)
+    quantiles = statistics.quantiles(timings, n=100)
+    return {
+        'calls': len(timings),
+        'throughput_per_s': len(timings) / elapsed,
+        'latency_us': {
+            'mean': statistics.fmean(timings) * 1e6,
+            'p50': quantiles[49] * 1e6,
+            'p95': quantiles[94] * 1e6,
+            'p99': quantiles[98] * 1e6,
+            'max': max(timings) * 1e6,
+        },
+        'peak_alloc_bytes': {
+            'mean': statistics.fmean(peaks),
+            'max': max(peaks),
+        },
+    }
+
+
+def report(label, result):
+    latency = result['latency_us']
+    peak = result['peak_alloc_bytes']
+    print(f'{label}: {result["calls"]} calls, {result["throughput_per_s"]:.0f}/s')
+    print(f'  p50 {latency["p50"]:8.1f} us  p95 {latency["p95"]:8.1f} us  p99 {latency["p99"]:8.1f} us')
+    print(f'  peak alloc mean {peak["mean"] / 1024:.1f} KiB, max {peak["max"] / 1024:.1f} KiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=3, help='passes over the full option space')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args()
+
+    options_list = list(app_module.iter_generate_options())
+    client = app_module.app.test_client()
+    app_module.config_pack = None
+
+    results = {}
+    for label, call in (
+        ('generate_comprehensive_cfg_cold', direct_call(cold=True)),
+        ('generate_comprehensive_cfg_warm', direct_call(cold=False)),
+        ('api_generate_cold', request_call(client, clear_cache=True, cold=True)),
+        ('api_generate_warm', request_call(client, clear_cache=True)),
+        ('api_generate_cached', request_call(client, clear_cache=False)),
+    ):
+        # Cold passes leave the section caches partly empty
+        app_module.warm_section_caches()
+        results[label] = summarize(call, options_list, args.rounds)
+        report(label, results[label])
+
+    if args.output:
+        document = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'generator_fingerprint': app_module.GENERATOR_FINGERPRINT,
+            'combinations': len(options_list),
+            'rounds': args.rounds,
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Per-render latency of generate_comprehensive_cfg.
+
+"cold" clears the section caches before every render, so each call pays for
+rendering every section template; "warm" is the steady state once the section
+caches are filled. Reports latency percentiles in microseconds.
+
+    python benchmarks/bench_render.py [--rounds 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+
+
+def bench_renders(rounds, cold):
+    options_list = list(app_module.iter_generate_options())
+    timings = []
+    for _ in range(rounds):
+        for options in options_list:
+            if cold:
+                app_module.clear_section_caches()
+            start = time.perf_counter()
+            app_module.generate_comprehensive_cfg(options)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label, timings):
+    quantiles = statistics.quantiles(timings, n=100)
+    print(f'{label}: {len(timings)} renders')
+    print(f'  mean {statistics.fmean(timings) * 1e6:8.1f} us')
+    print(f'  p50  {quantiles[49] * 1e6:8.1f} us')
+    print(f'  p95  {quantiles[94] * 1e6:8.1f} us')
+    print(f'  p99  {quantiles[98] * 1e6:8.1f} us')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=5, help='passes over the full option space')
+    args = parser.parse_args()
+
+    report('cold', bench_renders(args.rounds, cold=True))
+    app_module.warm_section_caches()
+    report('warm', bench_renders(args.rounds, cold=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Throughput of a running server under concurrent load.
+
+Each client thread opens a new connection per request (the dev server and
+gunicorn's sync workers do not keep connections alive) and the run reports
+requests per second and latency percentiles per endpoint.
+
+    python app.py                          # dev server on :3000
+    gunicorn -c gunicorn.conf.py           # production on :3000
+    python benchmarks/bench_serve.py [--url http://127.0.0.1:3000] [--concurrency 16] [--duration 10]
+"""
+
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+GENERATE_BODY = json.dumps({
+    'printer': 'voron2.4', 'size': '300', 'main_board': 'leviathan', 'toolhead_board': 'nitehawk',
+    'motors': 'ldo', 'probe': 'tap', 'print_start': 'standard',
+}).encode('utf-8')
+
+ENDPOINTS = {
+    'index': ('GET', '/', None),
+    'bootstrap': ('GET', '/api/bootstrap', None),
+    'generate': ('POST', '/api/generate', GENERATE_BODY),
+}
+
+
+def run(host, port, method, path, body, concurrency, duration):
+    timings = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        nonlocal errors
+        local = []
+        local_errors = 0
+        headers = {'Content-Type': 'application/json'} if body else {}
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    local_errors += 1
+            except OSError:
+                local_errors += 1
+            finally:
+                connection.close()
+            local.append(time.perf_counter() - start)
+        with lock:
+            timings.extend(local)
+            errors += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:3000', help='server to load')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per endpoint')
+    parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS), help='endpoints to load (default all)')
+    args = parser.parse_args()
+
+    parts = urlsplit(args.url)
+    for name in args.endpoint or ENDPOINTS:
+        method, path, body = ENDPOINTS[name]
+        timings, errors = run(parts.hostname, parts.port or 80, method, path, body, args.concurrency, args.duration)
+        quantiles = statistics.quantiles(timings, n=100)
+        print(f'{name}: {len(timings) / args.duration:8.1f} req/s  '
+              f'p50 {quantiles[49] * 1e3:6.1f} ms  p99 {quantiles[98] * 1e3:6.1f} ms  errors {errors}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Gunicorn settings for production.
+
+    gunicorn -c gunicorn.conf.py
+
+Every setting can be overridden with GUNICORN_* environment variables, or in
+.env (see .env.example). The app is preloaded, so the catalogs, templates,
+section caches and config pack are built once in the master process and
+shared by the forked workers.
+"""
+
+import multiprocessing
+import os
+
+from flask.cli import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+wsgi_app = 'app:app'
+preload_app = True
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:3000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Threads let a worker keep serving while other requests wait on GitHub
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Recycle workers now and then; with preload_app a respawn is just a fork
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+
+def post_fork(server, worker):
+    # Start per-process background work (reference prefetch) in each worker
+    import app
+    app.create_app()
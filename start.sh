@@ -20,6 +20,14 @@ fi
 echo "Installing dependencies..."
 uv pip install -r requirements.txt
 
+# Precompress static assets (.gz siblings served to gzip-capable clients)
+uv run flask --app app compress-static
+
 # Run the Flask application
-echo "Starting Voron Configurator on port 3000..."
+if [ "$1" = "--production" ]; then
+    echo "Starting Voron Configurator (gunicorn) on port 3000..."
+    exec uv run gunicorn -c gunicorn.conf.py
+fi
+
+echo "Starting Voron Configurator (development server) on port 3000..."
 uv run python app.py
\ No newline at end of file
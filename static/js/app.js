@@ -1,9 +1,50 @@
 // Voron Configurator - Ace Editor Version
 
+// Ace is not in the page head; the core and modules are fetched on demand so
+// the options form is interactive before the editor code has downloaded
+const AceLoader = {
+    core: null,
+    modules: new Map(),
+
+    loadCore() {
+        if (!this.core) {
+            this.core = new Promise((resolve, reject) => {
+                const script = document.createElement('script');
+                script.src = window.ACE_ASSETS.core;
+                script.async = true;
+                script.onload = () => {
+                    const modules = window.ACE_ASSETS.modules;
+                    Object.keys(modules).forEach(name => {
+                        ace.config.setModuleUrl(name, modules[name]);
+                    });
+                    resolve(window.ace);
+                };
+                script.onerror = () => {
+                    this.core = null;
+                    reject(new Error('Failed to load the editor'));
+                };
+                document.head.appendChild(script);
+            });
+        }
+        return this.core;
+    },
+
+    async loadModule(name) {
+        await this.loadCore();
+        if (!this.modules.has(name)) {
+            this.modules.set(name, new Promise(resolve => {
+                ace.config.loadModule(name, resolve);
+            }));
+        }
+        return this.modules.get(name);
+    }
+};
+
 class VoronConfigurator {
     constructor() {
         this.editor = null;
         this.currentConfig = null;
+        this.currentOptions = null;
         this.configContent = '';
         this.tabs = new Map();
         this.activeTab = 'main';
@@ -11,14 +52,21 @@ class VoronConfigurator {
         this.init();
     }
 
-    async init() {
-        await this.initAceEditor();
+    init() {
         this.setupEventListeners();
         this.updateInfoPanel();
+        this.editorReady = this.initAceEditor();
+        this.editorReady.catch(error => {
+            console.error('Error:', error);
+            this.setStatus('Error loading editor', 'error');
+        });
     }
 
     async initAceEditor() {
-        ace.require("ace/ext/language_tools");
+        await Promise.all([
+            AceLoader.loadModule('ace/mode/klipper'),
+            AceLoader.loadModule('ace/theme/mainsail')
+        ]);
         
         this.editor = ace.edit("ace-editor");
         // Use Mainsail theme - matches actual Mainsail editor colors
@@ -27,9 +75,6 @@ class VoronConfigurator {
         this.editor.session.setMode("ace/mode/klipper");
         
         this.editor.setOptions({
-            enableBasicAutocompletion: true,
-            enableLiveAutocompletion: false,
-            enableSnippets: true,
             showPrintMargin: false,
             highlightActiveLine: true,
             highlightSelectedWord: true,
@@ -43,6 +88,8 @@ class VoronConfigurator {
             useWorker: false
         });
         
+        this.enableLanguageToolsOnFocus(this.editor);
+        
         this.editor.setValue('; Voron Configurator - Based on LDO Kit Configuration\n; Select options and click Generate to create your printer.cfg', -1);
         
         // Set up cursor position tracking
@@ -60,6 +107,18 @@ class VoronConfigurator {
         this.updateFileStats();
     }
 
+    enableLanguageToolsOnFocus(editor) {
+        // Autocompletion is only needed once someone edits, so fetch it then
+        editor.once('focus', async () => {
+            await AceLoader.loadModule('ace/ext/language_tools');
+            editor.setOptions({
+                enableBasicAutocompletion: true,
+                enableLiveAutocompletion: false,
+                enableSnippets: true
+            });
+        });
+    }
+
     setupEventListeners() {
         document.getElementById('theme-select').addEventListener('change', (e) => {
             this.changeTheme(e.target.value);
@@ -88,8 +147,9 @@ class VoronConfigurator {
         this.setupTabEventListeners();
     }
 
-    changeTheme(themeId) {
+    async changeTheme(themeId) {
         document.body.dataset.theme = themeId;
+        await this.editorReady;
         
         const themeMap = {
             'crimson': 'mainsail',
@@ -156,8 +216,10 @@ class VoronConfigurator {
             const data = await response.json();
 
             if (data.success) {
+                await this.editorReady;
                 this.configContent = data.config;
                 this.currentConfig = data;
+                this.currentOptions = config;
                 this.editor.setValue(this.configContent, -1);
                 this.updateFileStats();
                 
@@ -198,16 +260,31 @@ class VoronConfigurator {
         this.setStatus('Downloading configuration...', 'loading');
 
         try {
-            const response = await fetch('/api/download', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    config: this.configContent,
-                    filename: this.currentConfig?.filename || 'printer.cfg'
-                })
-            });
+            await this.editorReady;
+            const content = this.editor.getValue();
+            const contentHash = this.currentConfig?.metadata?.content_hash;
+            let response = null;
+
+            // Unedited configs are still on the server under their content hash,
+            // so only upload the text when the user has changed it. The options
+            // let a worker that never saw the hash re-render it instead of 404ing
+            if (contentHash && content === this.configContent) {
+                const query = new URLSearchParams(this.currentOptions || {});
+                response = await fetch(`/api/download/${contentHash}?${query}`);
+            }
+
+            if (!response || !response.ok) {
+                response = await fetch('/api/download', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        config: content,
+                        filename: this.currentConfig?.filename || 'printer.cfg'
+                    })
+                });
+            }
 
             if (response.ok) {
                 const blob = await response.blob();
@@ -294,11 +371,13 @@ class VoronConfigurator {
             const data = await response.json();
 
             if (data.success) {
+                await this.editorReady;
                 // Switch to main tab and show the generated config
                 this.switchToTab('main');
                 this.editor.setValue(data.config, -1);
                 this.configContent = data.config;
                 this.currentConfig = data;
+                this.currentOptions = config;
                 this.updateFileStats();
                 
                 document.getElementById('download-btn').disabled = false;
@@ -337,7 +416,7 @@ class VoronConfigurator {
         });
     }
 
-    createReferenceTab(fullName, content, printer, board, revision) {
+    async createReferenceTab(fullName, content, printer, board, revision) {
         this.tabCounter++;
         const tabId = `tab-${this.tabCounter}`;
         const tabName = 'ldo_ref_printer.cfg';
@@ -408,14 +487,12 @@ class VoronConfigurator {
         this.switchToTab(tabId);
         
         // Initialize Ace editor for this tab
+        await this.editorReady;
         const tabEditor = ace.edit(`ace-editor-${tabId}`);
         tabEditor.setTheme("ace/theme/mainsail");
         tabEditor.session.setMode("ace/mode/klipper");
         
         tabEditor.setOptions({
-            enableBasicAutocompletion: true,
-            enableLiveAutocompletion: false,
-            enableSnippets: true,
             showPrintMargin: false,
             highlightActiveLine: true,
             readOnly: false,
@@ -423,6 +500,7 @@ class VoronConfigurator {
             useSoftTabs: true,
             useWorker: false
         });
+        this.enableLanguageToolsOnFocus(tabEditor);
         
         tabEditor.setValue(content, -1);
         
@@ -464,7 +542,7 @@ class VoronConfigurator {
         
         // Update current editor reference and resize
         if (tabId === 'main') {
-            this.editor.resize();
+            if (this.editor) this.editor.resize();
         } else if (this.tabs.has(tabId)) {
             const tabEditor = this.tabs.get(tabId).editor;
             if (tabEditor) {
@@ -502,7 +580,7 @@ class VoronConfigurator {
 
     getActiveTabContent() {
         if (this.activeTab === 'main') {
-            return this.editor.getValue();
+            return this.editor ? this.editor.getValue() : '';
         } else if (this.tabs.has(this.activeTab)) {
             return this.tabs.get(this.activeTab).editor.getValue();
         }
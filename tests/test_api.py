@@ -1,5 +1,8 @@
 """API Tests for Voron Configurator"""
 
+import gzip
+import re
+import flask
 import pytest
 import json
 from playwright.sync_api import Page
@@ -104,6 +107,397 @@ class TestGenerateConfig:
         assert 'success' in data
 
 
+
+class TestGenerateETag:
+    """Test content hashing and conditional requests on generated configs."""
+
+    OPTIONS = {'printer': 'voron2.4', 'size': '350', 'probe': 'beacon'}
+
+    def test_response_is_deterministic(self, client):
+        """Test that identical requests produce byte-identical responses."""
+        first = client.post('/api/generate', json=self.OPTIONS)
+        second = client.post('/api/generate', json=self.OPTIONS)
+
+        assert first.data == second.data
+        assert 'generated_at' not in json.loads(first.data)['metadata']
+
+    def test_etag_is_content_hash(self, client):
+        """Test that the strong ETag is the config's SHA-256."""
+        import hashlib
+        response = client.post('/api/generate', json=self.OPTIONS)
+        data = json.loads(response.data)
+        content_hash = hashlib.sha256(data['config'].encode('utf-8')).hexdigest()
+
+        assert data['metadata']['content_hash'] == content_hash
+        assert response.get_etag() == (content_hash, False)
+
+    def test_if_none_match_returns_304(self, client):
+        """Test that revalidating with a matching ETag returns no body."""
+        etag = client.post('/api/generate', json=self.OPTIONS).headers['ETag']
+
+        response = client.post('/api/generate', json=self.OPTIONS, headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == etag
+
+    def test_changed_options_miss_etag(self, client):
+        """Test that a stale ETag gets the new config."""
+        etag = client.post('/api/generate', json=self.OPTIONS).headers['ETag']
+
+        response = client.post('/api/generate', json={**self.OPTIONS, 'size': '250'},
+                               headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+
+class TestPrinterCfg:
+    """Test the cacheable GET /printer.cfg endpoint."""
+
+    CANONICAL = ('printer=trident&size=250&main_board=leviathan&toolhead_board=nitehawk'
+                 '&motors=ldo&probe=tap&print_start=standard&extruder=g2e_9t')
+
+    def test_canonical_url_returns_plain_text(self, client):
+        """Test that the canonical URL returns the raw config with cache headers."""
+        response = client.get(f'/printer.cfg?{self.CANONICAL}')
+        generated = json.loads(client.post('/api/generate', json={'printer': 'trident', 'size': '250'}).data)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert response.get_data(as_text=True) == generated['config']
+        assert response.get_etag() == (generated['metadata']['content_hash'], False)
+        assert response.cache_control.public
+        assert response.cache_control.max_age > 0
+
+    def test_non_canonical_query_redirects(self, client):
+        """Test that reordered or partial queries redirect to the canonical form."""
+        response = client.get('/printer.cfg?size=250&printer=trident&probe=bogus')
+
+        assert response.status_code == 301
+        assert response.headers['Location'].endswith(f'/printer.cfg?{self.CANONICAL}')
+
+    def test_conditional_get(self, client):
+        """Test that revalidation with the ETag returns 304."""
+        etag = client.get(f'/printer.cfg?{self.CANONICAL}').headers['ETag']
+
+        response = client.get(f'/printer.cfg?{self.CANONICAL}', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.data == b''
+
+
+class TestStoredDownload:
+    """Test downloading generated configs by content hash."""
+
+    def test_download_by_hash(self, client):
+        """Test that a generated config can be fetched back by its hash."""
+        generated = json.loads(client.post('/api/generate', json={'printer': 'trident'}).data)
+        content_hash = generated['metadata']['content_hash']
+
+        response = client.get(f'/api/download/{content_hash}')
+
+        assert response.status_code == 200
+        assert response.get_data(as_text=True) == generated['config']
+        assert 'attachment' in response.headers['Content-Disposition']
+        assert response.cache_control.immutable
+
+    def test_unknown_hash_returns_404(self, client):
+        """Test that hashes never generated (or evicted) are not found."""
+        response = client.get(f'/api/download/{"0" * 64}')
+
+        assert response.status_code == 404
+
+    def test_store_miss_rerenders_from_options(self, client):
+        """Test that a worker without the hash re-renders it from the options in the query."""
+        from app import config_store
+        options = {'printer': 'trident', 'size': '250'}
+        generated = json.loads(client.post('/api/generate', json=options).data)
+        content_hash = generated['metadata']['content_hash']
+        config_store.clear()
+
+        response = client.get(f'/api/download/{content_hash}', query_string=options)
+        mismatched = client.get(f'/api/download/{"0" * 64}', query_string=options)
+
+        assert response.status_code == 200
+        assert response.get_data(as_text=True) == generated['config']
+        assert mismatched.status_code == 404
+
+    def test_store_is_filled_at_render_time(self, client):
+        """Test that only a render writes to the store, not a generation cache hit."""
+        from app import config_store, generation_cache
+        generation_cache.clear()
+        options = {'printer': 'voron2.4', 'size': '250', 'probe': 'klicky'}
+
+        client.post('/api/generate', json=options)
+        size = len(config_store)
+        config_store.clear()
+        client.post('/api/generate', json=options)
+
+        assert size > 0
+        assert len(config_store) == 0
+
+
+class TestGenerationCache:
+    """Test the LRU cache in front of config generation."""
+
+    def test_repeat_request_is_cache_hit(self, client):
+        """Test that generating the same options twice hits the cache."""
+        from app import generation_cache
+        generation_cache.clear()
+        options = {'printer': 'trident', 'size': '250', 'main_board': 'octopus_pro'}
+
+        first = client.post('/api/generate', json=options)
+        hits_before = generation_cache.hits
+        second = client.post('/api/generate', json=options)
+
+        assert generation_cache.hits == hits_before + 1
+        assert json.loads(first.data)['config'] == json.loads(second.data)['config']
+
+    def test_unknown_ids_share_default_entry(self, client):
+        """Test that bogus option IDs resolve to the same cache key as the defaults."""
+        from app import resolve_generate_options
+
+        assert resolve_generate_options({'main_board': 'bogus', 'probe': 'nope'}) == \
+            resolve_generate_options({})
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        from app import LRUCache
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.stats()['evictions'] == 1
+
+    def test_stats_endpoint(self, client):
+        """Test that cache counters are exposed for scraping."""
+        response = client.get('/api/stats')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['success'] is True
+        assert {'hits', 'misses', 'evictions', 'size', 'maxsize'} <= set(data['generation_cache'])
+
+
+class TestSectionCache:
+    """Test section-level memoization inside the generator."""
+
+    def test_new_combination_reuses_sections(self):
+        """Test that changing only the extruder re-renders only the extruder section."""
+        import app as app_module
+        app_module.clear_section_caches()
+        base = app_module.resolve_generate_options({'printer': 'trident', 'main_board': 'manta_m8p'})
+        app_module.generate_comprehensive_cfg(base)
+
+        app_module.generate_comprehensive_cfg(base._replace(extruder='bondtech_lgx'))
+        stats = app_module.section_cache_stats()
+
+        assert stats['extruder_section']['misses'] == 2
+        assert stats['header_section']['misses'] == 1
+        assert stats['header_section']['hits'] == 1
+        assert stats['macro_section']['hits'] == 1
+
+    def test_sections_assemble_full_config(self):
+        """Test that the streamed sections join into the full config."""
+        from app import generate_comprehensive_cfg, iter_config_sections, resolve_generate_options
+        options = resolve_generate_options({'toolhead_board': 'ebb_sb2209', 'probe': 'beacon'})
+
+        assert ''.join(iter_config_sections(options)) == generate_comprehensive_cfg(options)
+        assert 'CAN BUS SETUP NOTES' in generate_comprehensive_cfg(options)
+
+
+class TestCfgTemplates:
+    """Test the precompiled printer.cfg section templates."""
+
+    def test_klipper_macros_pass_through(self):
+        """Test that Klipper's own Jinja syntax in macros is emitted verbatim."""
+        from app import generate_voron24_macros
+
+        macros = generate_voron24_macros(300, 300, 'better')
+
+        assert '{% set BED_TEMP = params.BED|default(60)|float %}' in macros
+        assert 'M190 S{{BED_TEMP}}' in macros
+        assert 'G1 X{150.0} Y{150.0} F3000' in macros
+
+    def test_bytecode_cache_is_written(self, tmp_path):
+        """Test that compiled templates are stored for the next worker boot."""
+        from app import create_cfg_template_env
+
+        env = create_cfg_template_env(str(tmp_path))
+        env.get_template('header.cfg')
+
+        assert any(tmp_path.iterdir())
+
+    def test_unwritable_bytecode_cache_is_disabled(self, tmp_path, monkeypatch):
+        """Test that a cache directory that cannot be written to falls back to no cache."""
+        from jinja2 import FileSystemBytecodeCache
+        from app import load_cfg_templates
+
+        def read_only(self, bucket):
+            raise PermissionError(13, 'Read-only file system')
+        monkeypatch.setattr(FileSystemBytecodeCache, 'dump_bytecode', read_only)
+
+        env, templates = load_cfg_templates(str(tmp_path))
+
+        assert env.bytecode_cache is None
+        assert 'header.cfg' in templates
+
+
+class TestGenerateStream:
+    """Test the streaming config endpoint."""
+
+    def test_stream_matches_generate(self, client):
+        """Test that the streamed text equals the JSON endpoint's config."""
+        options = {'printer': 'trident', 'toolhead_board': 'ebb36', 'print_start': 'better'}
+        generated = json.loads(client.post('/api/generate', json=options).data)['config']
+
+        response = client.post('/api/generate/stream', json=options)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert response.is_streamed
+        assert response.get_data(as_text=True) == generated
+
+    def test_stream_accepts_query_string(self, client):
+        """Test that the stream can be fetched with GET for CLI use."""
+        response = client.get('/api/generate/stream?printer=voron2.4&main_board=octopus_v1')
+
+        assert response.status_code == 200
+        assert '[stepper_z3]' in response.get_data(as_text=True)
+
+    def test_stream_rejects_non_object_body(self, client):
+        """Test that a JSON array or string body is rejected."""
+        for body in (['trident'], 'trident'):
+            response = client.post('/api/generate/stream', json=body)
+
+            assert response.status_code == 400
+            assert json.loads(response.data)['success'] is False
+
+
+class TestGenerateBatch:
+    """Test the batch generation endpoint."""
+
+    BATCH = [
+        {'printer': 'trident', 'main_board': 'octopus_v1'},
+        {'printer': 'voron2.4', 'probe': 'beacon'},
+        {'printer': 'trident', 'main_board': 'octopus_v1', 'probe': 'bogus'},
+    ]
+
+    def test_batch_returns_results_in_order(self, client):
+        """Test that results line up with the input and duplicates are rendered once."""
+        response = client.post('/api/generate/batch', json={'configs': self.BATCH})
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['success'] is True
+        assert data['unique'] == 2
+        assert len(data['results']) == 3
+        for options, result in zip(self.BATCH, data['results']):
+            single = json.loads(client.post('/api/generate', json=options).data)
+            assert result['config'] == single['config']
+
+    def test_batch_ndjson(self, client):
+        """Test that NDJSON output has one result per line."""
+        response = client.post('/api/generate/batch?format=ndjson', json=self.BATCH)
+
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        assert len(lines) == 3
+        assert json.loads(lines[0])['metadata']['printer'] == 'Voron Trident'
+
+    def test_batch_uses_process_pool(self, client, app, monkeypatch):
+        """Test that large batches render through the process pool."""
+        from app import generation_cache
+        generation_cache.clear()
+        monkeypatch.setitem(app.config, 'BATCH_POOL_THRESHOLD', 1)
+
+        response = client.post('/api/generate/batch', json=self.BATCH)
+
+        data = json.loads(response.data)
+        assert data['results'][0]['config'] == data['results'][2]['config']
+        assert '[z_tilt]' in data['results'][0]['config']
+
+    def test_batch_rejects_invalid_body(self, client):
+        """Test that a body that is not a list of objects is rejected."""
+        response = client.post('/api/generate/batch', json={'configs': 'voron2.4'})
+
+        assert response.status_code == 400
+
+    def test_batch_non_string_options_use_defaults(self, client):
+        """Test that non-string option values are treated as unknown IDs."""
+        response = client.post('/api/generate/batch', json=[{'printer': ['x'], 'size': 300, 'probe': None}])
+
+        assert response.status_code == 200
+        metadata = json.loads(response.data)['results'][0]['metadata']
+        assert metadata['printer'] == 'Voron 2.4'
+
+
+class TestConfigPack:
+    """Test pre-rendered config packs."""
+
+    OPTIONS = [
+        ('voron2.4', '300', 'leviathan', 'nitehawk', 'ldo', 'tap', 'standard', 'g2e_9t'),
+        ('trident', '250', 'spider_v23', 'ebb36', 'ldo', 'beacon', 'better', 'bondtech_cw1'),
+    ]
+
+    def build_pack(self, path, compress):
+        import app as app_module
+        options = [app_module.GenerateOptions(*o) for o in self.OPTIONS]
+        app_module.build_config_pack(str(path), compress=compress, options_iter=options)
+        return app_module.load_config_pack(str(path)), options
+
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_pack_matches_live_render(self, tmp_path, compress):
+        """Test that pack entries are identical to freshly rendered configs."""
+        from app import render_generated_config
+        pack, options = self.build_pack(tmp_path / 'configs.pack', compress)
+
+        for o in options:
+            assert pack.read(o).decode('utf-8') == render_generated_config(o)[0]
+        pack.close()
+
+    def test_stale_pack_is_ignored(self, tmp_path, monkeypatch):
+        """Test that a pack built for different catalogs is not loaded."""
+        import app as app_module
+        path = tmp_path / 'configs.pack'
+        self.build_pack(path, False)[0].close()
+        monkeypatch.setattr(app_module, 'GENERATOR_FINGERPRINT', 'changed')
+
+        assert app_module.load_config_pack(str(path)) is None
+
+    def test_corrupt_pack_is_ignored(self, tmp_path):
+        """Test that a truncated or foreign pack file is skipped instead of aborting startup."""
+        import app as app_module
+        path = tmp_path / 'configs.pack'
+        self.build_pack(path, False)[0].close()
+        data = path.read_bytes()
+
+        for corrupt in (data[:len(app_module.CONFIG_PACK_MAGIC) + 4], data[:200], b'not a pack', b''):
+            path.write_bytes(corrupt)
+            assert app_module.load_config_pack(str(path)) is None
+
+    def test_download_served_from_pack(self, client, tmp_path, monkeypatch):
+        """Test that GET downloads stream gzip'd pack entries untouched."""
+        import gzip
+        import app as app_module
+        pack, options = self.build_pack(tmp_path / 'configs.pack', True)
+        monkeypatch.setattr(app_module, 'config_pack', pack)
+        query = dict(zip(app_module.GenerateOptions._fields, self.OPTIONS[1]))
+
+        response = client.get('/api/download', query_string=query, headers={'Accept-Encoding': 'gzip'})
+
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'attachment' in response.headers['Content-Disposition']
+        assert gzip.decompress(response.data) == pack.read(options[1])
+        response.close()
+        pack.close()
+
 class TestReferenceConfigs:
     """Test the LDO reference config endpoints."""
 
@@ -138,6 +532,130 @@ class TestReferenceConfigs:
         assert response.status_code == 404
 
 
+class TestBootstrap:
+    """Test the precomputed catalog payloads."""
+
+    def test_bootstrap_contents(self, client):
+        """Test that bootstrap carries catalogs, references and themes."""
+        response = client.get('/api/bootstrap')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert 'leviathan' in data['catalog']['main_boards']
+        assert 'voron2.4_leviathan_rev_d' in data['references']
+        assert data['default_theme'] in data['themes']
+        assert response.cache_control.public
+        assert response.cache_control.max_age > 0
+
+    @pytest.mark.parametrize('path', ['/api/bootstrap', '/api/reference-configs'])
+    def test_revalidation_returns_304(self, client, path):
+        """Test that a client holding the ETag gets an empty 304."""
+        etag = client.get(path).headers['ETag']
+
+        response = client.get(path, headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.data == b''
+
+
+class TestCompression:
+    """Test gzip for API responses and precompressed static files."""
+
+    def test_generate_is_gzipped(self, client):
+        """Test that large JSON responses are gzip'd when the client accepts it."""
+        plain = client.post('/api/generate', json={'printer': 'trident'})
+        response = client.post('/api/generate', json={'printer': 'trident'}, headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.data) == plain.data
+        assert response.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+        assert 'Content-Encoding' not in plain.headers
+
+    def test_gzip_etag_revalidates(self, client):
+        """Test that the gzip ETag is accepted for If-None-Match."""
+        headers = {'Accept-Encoding': 'gzip'}
+        etag = client.post('/api/generate', json={}, headers=headers).headers['ETag']
+
+        response = client.post('/api/generate', json={}, headers={**headers, 'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+
+    def test_shared_etag_keeps_representations_apart(self, client):
+        """Test that JSON and plain text tagged with the same content hash get their own gzip bodies."""
+        from app import gzip_cache
+        gzip_cache.clear()
+        headers = {'Accept-Encoding': 'gzip'}
+        response = client.post('/api/generate', json={'printer': 'trident', 'size': '250'}, headers=headers)
+        generated = json.loads(gzip.decompress(response.data))
+        config = generated['config']
+
+        cfg = client.get(f'/printer.cfg?{TestPrinterCfg.CANONICAL}', headers=headers)
+        stored = client.get(f"/api/download/{generated['metadata']['content_hash']}", headers=headers)
+
+        assert cfg.mimetype == 'text/plain'
+        assert gzip.decompress(cfg.data).decode('utf-8') == config
+        assert gzip.decompress(stored.data).decode('utf-8') == config
+
+    def test_small_responses_not_gzipped(self, client):
+        """Test that responses under the size threshold go out as-is."""
+        response = client.get('/api/ready', headers={'Accept-Encoding': 'gzip'})
+
+        assert 'Content-Encoding' not in response.headers
+
+    def test_precompressed_static(self, client, tmp_path, monkeypatch):
+        """Test that a static file with a .gz sibling is served compressed."""
+        import app as app_module
+        source = tmp_path / 'app.js'
+        source.write_text('console.log("voron");\n' * 200)
+        app_module.compress_static_files(str(tmp_path))
+        monkeypatch.setitem(app_module.static_gz, 'js/app.js', str(tmp_path / 'app.js.gz'))
+
+        response = client.get('/static/js/app.js', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.mimetype == 'text/javascript'
+        assert gzip.decompress(response.data) == source.read_bytes()
+        response.close()
+        plain = client.get('/static/js/app.js')
+        assert 'Content-Encoding' not in plain.headers
+        assert 'Accept-Encoding' in plain.headers['Vary']
+        plain.close()
+
+
+class TestStaticFingerprints:
+    """Test content-hashed static URLs."""
+
+    def test_index_uses_hashed_urls(self, client):
+        """Test that static URLs carry a content hash instead of ?v= query strings."""
+        html = client.get('/').get_data(as_text=True)
+
+        assert '?v=' not in html
+        assert re.search(r'/static/js/app\.[0-9a-f]{12}\.js', html)
+
+    def test_hashed_url_is_immutable(self, app, client):
+        """Test that the current hash is served with a one-year immutable lifetime."""
+        with app.test_request_context():
+            url = flask.url_for('static', filename='js/app.js')
+
+        response = client.get(url)
+
+        assert response.status_code == 200
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == 31536000
+        assert not response.cache_control.no_cache
+        response.close()
+
+    def test_stale_hash_serves_current_file(self, client):
+        """Test that an old hash still resolves, without the immutable lifetime."""
+        response = client.get('/static/js/app.000000000000.js')
+
+        assert response.status_code == 200
+        assert not response.cache_control.immutable
+        response.close()
+
+
 class TestMainPage:
     """Test the main page endpoint."""
 
@@ -149,6 +667,45 @@ class TestMainPage:
         assert b'Voron Configurator' in response.data
         assert b'ace-editor' in response.data
 
+    def test_main_page_loads_ace_on_demand(self, client):
+        """Test that Ace is not loaded by blocking script tags in the page."""
+        html = client.get('/').get_data(as_text=True)
+
+        assert not re.search(r'<script src="[^"]*/ace/', html)
+        assert re.search(r'rel="preload" as="script" href="/static/js/ace/ace\.[0-9a-f]{12}\.js"', html)
+        assert re.search(r"'ace/ext/language_tools': \"/static/js/ace/ext-language_tools\.[0-9a-f]{12}\.js\"", html)
+
+    def test_main_page_rendered_once(self, client, monkeypatch):
+        """Test that repeat hits are served from the page cache without rendering."""
+        import app as app_module
+        app_module.page_cache.clear()
+        renders = []
+        monkeypatch.setattr(app_module, 'render_template', lambda *args, **kwargs: renders.append(args) or '<html></html>')
+
+        first = client.get('/')
+        second = client.get('/')
+
+        assert len(renders) == 1
+        assert first.data == second.data
+        assert first.headers['ETag'] == second.headers['ETag']
+        assert first.cache_control.no_cache
+        app_module.page_cache.clear()
+
+    def test_main_page_revalidation_and_gzip(self, client):
+        """Test that the page answers If-None-Match and serves its precompressed body."""
+        plain = client.get('/')
+        zipped = client.get('/', headers={'Accept-Encoding': 'gzip'})
+
+        assert zipped.content_encoding == 'gzip'
+        assert gzip.decompress(zipped.data) == plain.data
+        assert zipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+        assert 'Accept-Encoding' in zipped.vary
+
+        revalidated = client.get('/', headers={'If-None-Match': plain.headers['ETag']})
+        assert revalidated.status_code == 304
+        revalidated = client.get('/', headers={'If-None-Match': zipped.headers['ETag'], 'Accept-Encoding': 'gzip'})
+        assert revalidated.status_code == 304
+
 
 class TestReferenceView:
     """Test the simplified reference config view page - SKIPPED (feature temporarily removed)."""
@@ -0,0 +1,635 @@
+"""Reference cache tests against a local stand-in for raw.githubusercontent.com"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app as app_module
+from app import CircuitBreaker, HTTPConnectionPool, ReferenceCache, ReferenceWarmup, SingleFlight
+
+
+class ReferenceServer:
+    """Serves a mutable body with an ETag over HTTP/1.1 keep-alive and honours If-None-Match."""
+
+    def __init__(self):
+        self.body = b'[mcu]\nserial: /dev/serial/by-id/usb-Klipper\n'
+        self.etag = '"v1"'
+        self.requests = []
+        self.status = None
+        self.delay = 0
+        self.trickle = 0
+        self.drop_connections = False
+        self.connections = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                server.connections.add(self.client_address)
+                time.sleep(server.delay)
+                # Close after responding without announcing it, like an idle timeout
+                self.close_connection = server.drop_connections
+                if server.status is not None:
+                    self.send_response(server.status)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                elif self.headers.get('If-None-Match') == server.etag:
+                    self.send_response(304)
+                    self.send_header('ETag', server.etag)
+                    self.end_headers()
+                else:
+                    self.send_response(200)
+                    self.send_header('ETag', server.etag)
+                    self.send_header('Last-Modified', 'Sat, 17 Oct 2026 12:00:00 GMT')
+                    self.send_header('Content-Length', str(len(server.body)))
+                    self.end_headers()
+                    if not server.trickle:
+                        self.wfile.write(server.body)
+                        return
+                    # Send the body a byte at a time, like a stalling upstream
+                    for i in range(len(server.body)):
+                        self.wfile.write(server.body[i:i + 1])
+                        time.sleep(server.trickle)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/printer.cfg'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def reference_server():
+    server = ReferenceServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def upstream():
+    pool = HTTPConnectionPool(connect_timeout=5, read_timeout=5, maxsize=4)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def served_reference(tmp_path, reference_server, upstream, monkeypatch):
+    """Point the voron2.4 Leviathan rev D reference at the local server, through a fresh cache."""
+    monkeypatch.setattr(app_module, 'reference_cache', ReferenceCache(str(tmp_path), ttl=3600, client=upstream))
+    config_info = dict(app_module.LDO_REFERENCE_CONFIGS['voron2.4']['leviathan']['rev_d'], url=reference_server.url)
+    monkeypatch.setitem(app_module.LDO_REFERENCE_CONFIGS['voron2.4']['leviathan'], 'rev_d', config_info)
+    return reference_server
+
+
+class TestReferenceCache:
+    """Test TTL handling and conditional revalidation."""
+
+    def test_fresh_entry_served_without_request(self, tmp_path, reference_server, upstream):
+        """Test that a fresh entry does not hit the network again."""
+        cache = ReferenceCache(str(tmp_path), ttl=3600, client=upstream)
+
+        assert cache.get(reference_server.url) == reference_server.body
+        assert cache.get(reference_server.url) == reference_server.body
+        assert len(reference_server.requests) == 1
+        assert cache.stats()['hits'] == 1
+
+    def test_stale_entry_revalidates_with_304(self, tmp_path, reference_server, upstream):
+        """Test that an expired entry sends validators and keeps its body on 304."""
+        cache = ReferenceCache(str(tmp_path), ttl=0, client=upstream)
+        cache.get(reference_server.url)
+
+        assert cache.get(reference_server.url) == reference_server.body
+        revalidation = reference_server.requests[-1]
+        assert revalidation['If-None-Match'] == '"v1"'
+        assert revalidation['If-Modified-Since'] == 'Sat, 17 Oct 2026 12:00:00 GMT'
+        assert cache.stats()['revalidated'] == 1
+
+    def test_changed_upstream_replaces_body(self, tmp_path, reference_server, upstream):
+        """Test that a new ETag upstream is picked up on revalidation."""
+        cache = ReferenceCache(str(tmp_path), ttl=0, client=upstream)
+        cache.get(reference_server.url)
+        reference_server.body = b'[mcu]\nserial: /dev/ttyAMA0\n'
+        reference_server.etag = '"v2"'
+
+        assert cache.get(reference_server.url) == b'[mcu]\nserial: /dev/ttyAMA0\n'
+        assert cache.stats()['fetches'] == 2
+
+    def test_entries_survive_restart(self, tmp_path, reference_server, upstream):
+        """Test that a new cache instance reads entries back from disk."""
+        ReferenceCache(str(tmp_path), ttl=3600, client=upstream).get(reference_server.url)
+        cache = ReferenceCache(str(tmp_path), ttl=3600, client=upstream)
+
+        assert cache.get(reference_server.url) == reference_server.body
+        assert len(reference_server.requests) == 1
+
+    def test_304_refreshes_ttl_on_disk(self, tmp_path, reference_server, upstream):
+        """Test that revalidation persists the new freshness timestamp."""
+        cache = ReferenceCache(str(tmp_path), ttl=0, client=upstream)
+        cache.get(reference_server.url)
+        before = time.time()
+        cache.get(reference_server.url)
+
+        meta_path, = tmp_path.glob('*.json')
+        assert json.loads(meta_path.read_text())['fetched_at'] >= before
+
+    def test_upstream_error_raises(self, tmp_path, reference_server, upstream):
+        """Test that upstream failures surface and are counted."""
+        cache = ReferenceCache(str(tmp_path), ttl=3600, client=upstream)
+        reference_server.status = 502
+
+        with pytest.raises(app_module.UpstreamError):
+            cache.get(reference_server.url)
+        assert cache.stats()['errors'] == 1
+
+
+class TestStaleReferences:
+    """Test stale-while-revalidate and stale-if-error serving."""
+
+    def wait_for(self, predicate, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            assert time.monotonic() < deadline, 'timed out'
+            time.sleep(0.01)
+
+    def test_stale_served_while_refreshing(self, tmp_path, reference_server, upstream):
+        """Test that an expired entry returns immediately and refreshes in the background."""
+        cache = ReferenceCache(str(tmp_path), ttl=0, client=upstream, max_stale=60)
+        old_body = cache.get(reference_server.url)
+        reference_server.body = b'[mcu]\nserial: /dev/ttyAMA0\n'
+        reference_server.etag = '"v2"'
+        reference_server.delay = 0.3
+
+        start = time.monotonic()
+        assert cache.get(reference_server.url) == old_body
+        assert time.monotonic() - start < 0.2
+
+        self.wait_for(lambda: cache.stats()['fetches'] == 2 and cache.stats()['refreshing'] == 0)
+        reference_server.delay = 0
+        assert cache.get(reference_server.url) == b'[mcu]\nserial: /dev/ttyAMA0\n'
+        assert cache.stats()['stale_served'] == 2
+
+    def test_stale_if_error(self, tmp_path, reference_server, upstream):
+        """Test that an upstream failure serves the cached copy within the window."""
+        cache = ReferenceCache(str(tmp_path), ttl=0, client=upstream, stale_if_error=60)
+        body = cache.get(reference_server.url)
+        reference_server.status = 503
+
+        assert cache.get(reference_server.url) == body
+        assert cache.stats()['stale_on_error'] == 1
+
+    def test_error_past_window_raises(self, tmp_path, reference_server, upstream):
+        """Test that entries older than the stale-if-error window are not served."""
+        cache = ReferenceCache(str(tmp_path), ttl=0, client=upstream, stale_if_error=0)
+        cache.get(reference_server.url)
+        reference_server.status = 503
+
+        with pytest.raises(app_module.UpstreamError):
+            cache.get(reference_server.url)
+
+
+class TestCircuitBreaker:
+    """Test the upstream circuit breaker and fetch deadline."""
+
+    def test_breaker_states(self):
+        """Test closed -> open -> half-open -> closed transitions."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        time.sleep(0.06)
+        assert breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.stats()['trips'] == 1
+
+    def test_failed_probe_reopens(self):
+        """Test that a failing half-open probe opens the circuit again."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()['trips'] == 2
+
+    def test_open_circuit_fails_fast(self, tmp_path, reference_server, upstream):
+        """Test that an open circuit stops contacting the upstream."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        cache = ReferenceCache(str(tmp_path), ttl=3600, client=upstream, breaker=breaker)
+        reference_server.status = 503
+
+        for _ in range(2):
+            with pytest.raises(app_module.UpstreamError):
+                cache.get(reference_server.url)
+        with pytest.raises(app_module.CircuitOpenError):
+            cache.get(reference_server.url)
+        assert len(reference_server.requests) == 2
+
+    def test_open_circuit_serves_stale(self, tmp_path, reference_server, upstream):
+        """Test that an open circuit falls back to the cached copy."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        cache = ReferenceCache(str(tmp_path), ttl=0, client=upstream, stale_if_error=60, breaker=breaker)
+        body = cache.get(reference_server.url)
+        reference_server.status = 503
+        cache.get(reference_server.url)
+
+        assert cache.get(reference_server.url) == body
+        assert len(reference_server.requests) == 2
+        assert cache.stats()['circuit_breaker']['rejected'] == 1
+
+    def test_deadline_bounds_fetch(self, tmp_path, reference_server, upstream):
+        """Test that a slow upstream is cut off at the deadline and counted as a failure."""
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout=60)
+        cache = ReferenceCache(str(tmp_path), ttl=3600, client=upstream, breaker=breaker, deadline=0.1)
+        reference_server.delay = 0.5
+
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            cache.get(reference_server.url)
+        assert time.monotonic() - start < 0.4
+        assert breaker.consecutive_failures == 1
+
+    def test_deadline_bounds_trickling_body(self, tmp_path, reference_server, upstream):
+        """Test that a body trickling in under the read timeout is still cut off at the deadline."""
+        cache = ReferenceCache(str(tmp_path), ttl=3600, client=upstream, deadline=0.3)
+        reference_server.body = b'x' * 40
+        reference_server.trickle = 0.05
+
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            cache.get(reference_server.url)
+        assert time.monotonic() - start < 0.6
+
+
+class TestSingleFlight:
+    """Test coalescing of concurrent fetches."""
+
+    def run_concurrently(self, fn, count):
+        barrier = threading.Barrier(count)
+        results = [None] * count
+
+        def worker(index):
+            barrier.wait()
+            try:
+                results[index] = fn()
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_misses_share_one_fetch(self, tmp_path, reference_server, upstream):
+        """Test that simultaneous misses for one URL make a single upstream request."""
+        cache = ReferenceCache(str(tmp_path), ttl=3600, client=upstream)
+        reference_server.delay = 0.2
+
+        results = self.run_concurrently(lambda: cache.get(reference_server.url), 8)
+
+        assert results == [reference_server.body] * 8
+        assert len(reference_server.requests) == 1
+        assert cache.stats()['single_flight'] == {'originating': 1, 'coalesced': 7, 'in_flight': 0}
+
+    def test_error_is_shared(self):
+        """Test that waiters receive the originating call's exception."""
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.1)
+            raise ValueError('upstream down')
+
+        results = self.run_concurrently(lambda: flight.do('key', fail), 4)
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.stats()['originating'] == 1
+
+
+class TestReferenceConfigEndpoint:
+    """Test /api/reference-config through the reference cache."""
+
+    def test_endpoint_uses_cache(self, client, tmp_path, reference_server, upstream, monkeypatch):
+        """Test that repeated requests for a reference only fetch it once."""
+        monkeypatch.setattr(app_module, 'reference_cache', ReferenceCache(str(tmp_path), ttl=3600, client=upstream))
+        config_info = dict(app_module.LDO_REFERENCE_CONFIGS['voron2.4']['leviathan']['rev_d'], url=reference_server.url)
+        monkeypatch.setitem(app_module.LDO_REFERENCE_CONFIGS['voron2.4']['leviathan'], 'rev_d', config_info)
+
+        for _ in range(3):
+            response = client.get('/api/reference-config?printer=voron2.4&board=leviathan&revision=rev_d')
+            assert response.status_code == 200
+            assert json.loads(response.data)['content'] == reference_server.body.decode('utf-8')
+        assert len(reference_server.requests) == 1
+
+
+class TestHTTPConnectionPool:
+    """Test connection reuse and timeouts of the upstream pool."""
+
+    def test_connections_are_reused(self, tmp_path, reference_server, upstream):
+        """Test that sequential fetches to one host share a connection."""
+        cache = ReferenceCache(str(tmp_path), ttl=0, client=upstream)
+
+        for _ in range(3):
+            cache.get(reference_server.url)
+
+        assert len(reference_server.connections) == 1
+        assert upstream.stats()['opened'] == 1
+        assert upstream.stats()['reused'] == 2
+        assert upstream.stats()['idle'] == 1
+
+    def test_closed_idle_connection_is_retried(self, reference_server, upstream):
+        """Test that a connection the server dropped while idle is replaced transparently."""
+        reference_server.drop_connections = True
+
+        for _ in range(2):
+            status, _, body = upstream.request('GET', reference_server.url)
+            assert status == 200
+            assert body == reference_server.body
+
+        assert upstream.stats()['opened'] == 2
+
+    def test_retry_skips_other_stale_connections(self, reference_server, upstream):
+        """Test that the retry opens a new connection rather than taking another dropped idle one."""
+        reference_server.drop_connections = True
+        reference_server.delay = 0.2
+        threads = [threading.Thread(target=upstream.request, args=('GET', reference_server.url)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert upstream.stats()['idle'] == 2
+        reference_server.delay = 0
+
+        status, _, body = upstream.request('GET', reference_server.url)
+
+        assert status == 200
+        assert body == reference_server.body
+        assert upstream.stats()['opened'] == 3
+
+    def test_read_timeout(self, reference_server):
+        """Test that a slow response is bounded by the read timeout."""
+        pool = HTTPConnectionPool(connect_timeout=5, read_timeout=0.05, maxsize=4)
+        reference_server.delay = 0.3
+
+        with pytest.raises(TimeoutError):
+            pool.request('GET', reference_server.url)
+        assert pool.stats()['in_use'] == 0
+
+
+class TestReferenceWarmup:
+    """Test the startup prefetch and readiness endpoint."""
+
+    def test_prefetch_fills_cache(self, tmp_path, reference_server, upstream):
+        """Test that warm-up fetches every URL and then reports ready."""
+        cache = ReferenceCache(str(tmp_path), ttl=3600, client=upstream)
+        urls = [f'{reference_server.url}?rev={n}' for n in range(6)]
+        warmup = ReferenceWarmup()
+
+        warmup.start(cache, urls, max_workers=3, budget=5).join()
+
+        assert warmup.status()['ready'] is True
+        assert warmup.status()['fetched'] == 6
+        assert cache.stats()['fetches'] == 6
+        cache.get(urls[0])
+        assert len(reference_server.requests) == 6
+
+    def test_budget_marks_ready(self, tmp_path, reference_server, upstream):
+        """Test that a slow upstream cannot hold readiness past the budget."""
+        cache = ReferenceCache(str(tmp_path), ttl=3600, client=upstream)
+        reference_server.delay = 0.5
+        warmup = ReferenceWarmup()
+
+        warmup.start(cache, [reference_server.url], max_workers=1, budget=0.05)
+
+        assert warmup.ready.wait(0.4)
+        assert warmup.status()['pending'] == 1
+
+    def test_ready_endpoint(self, client, monkeypatch):
+        """Test that /api/ready answers 503 until warm-up completes."""
+        warmup = ReferenceWarmup()
+        monkeypatch.setattr(app_module, 'reference_warmup', warmup)
+        monkeypatch.setattr(app_module, '_started_pid', os.getpid())
+
+        assert client.get('/api/ready').status_code == 503
+        warmup.ready.set()
+        assert client.get('/api/ready').status_code == 200
+
+    def test_first_request_starts_prefetch(self, client, app, served_reference, reference_server, monkeypatch):
+        """Test that prefetch starts without create_app, as under flask run or a bare WSGI server."""
+        warmup = ReferenceWarmup()
+        monkeypatch.setattr(app_module, 'reference_warmup', warmup)
+        monkeypatch.setattr(app_module, 'reference_snapshot', None)
+        monkeypatch.setattr(app_module, 'iter_reference_urls', lambda: [reference_server.url])
+        monkeypatch.setattr(app_module, '_started_pid', None)
+        monkeypatch.setitem(app.config, 'REFERENCE_PREFETCH', True)
+
+        client.get('/api/ready')
+
+        assert warmup.ready.wait(2)
+        assert warmup.status()['fetched'] == 1
+        assert client.get('/api/ready').status_code == 200
+
+
+@pytest.fixture
+def checkouts(tmp_path):
+    """Local stand-ins for the LDO git checkouts, one file per reference URL."""
+    dirs = {}
+    for url in app_module.iter_reference_urls():
+        repo, repo_path = app_module.reference_repo_path(url)
+        dirs.setdefault(repo, tmp_path / 'checkouts' / repo)
+        path = dirs[repo] / repo_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f'# {repo_path}\n[mcu]\n')
+    return dirs
+
+
+class TestReferenceSnapshot:
+    """Test the offline snapshot and refresh-references command."""
+
+    def test_refresh_from_checkouts(self, runner, tmp_path, checkouts):
+        """Test that the command snapshots every reference from local checkouts."""
+        path = tmp_path / 'snapshot.json.gz'
+        args = ['refresh-references', '-o', str(path)]
+        for repo, directory in checkouts.items():
+            args += ['--checkout', f'{repo}={directory}']
+
+        result = runner.invoke(args=args)
+
+        assert result.exit_code == 0, result.output
+        snapshot = app_module.load_reference_snapshot(str(path))
+        urls = list(app_module.iter_reference_urls())
+        assert snapshot.stats()['entries'] == len(urls)
+        _, repo_path = app_module.reference_repo_path(urls[0])
+        assert snapshot.get(urls[0]) == f'# {repo_path}\n[mcu]\n'.encode('utf-8')
+
+    def test_version_tracks_content(self, tmp_path, checkouts):
+        """Test that identical content gives an identical version."""
+        first = app_module.build_reference_snapshot(str(tmp_path / 'a.json.gz'), checkouts)
+        second = app_module.build_reference_snapshot(str(tmp_path / 'b.json.gz'), checkouts)
+        changed = next(next(iter(checkouts.values())).glob('Firmware/*.cfg'))
+        changed.write_text('changed\n')
+        third = app_module.build_reference_snapshot(str(tmp_path / 'c.json.gz'), checkouts)
+
+        assert first['version'] == second['version'] != third['version']
+
+    def test_unknown_format_ignored(self, tmp_path):
+        """Test that snapshots from a newer format are not loaded."""
+        path = tmp_path / 'snapshot.json.gz'
+        path.write_bytes(gzip.compress(json.dumps({'format': 99}).encode('utf-8')))
+
+        assert app_module.load_reference_snapshot(str(path)) is None
+
+    def test_endpoint_serves_snapshot_offline(self, client, tmp_path, checkouts, monkeypatch):
+        """Test that snapshot entries are served without touching the network."""
+        path = tmp_path / 'snapshot.json.gz'
+        app_module.build_reference_snapshot(str(path), checkouts)
+        monkeypatch.setattr(app_module, 'reference_snapshot', app_module.load_reference_snapshot(str(path)))
+        offline = ReferenceCache(None, ttl=0, client=None)
+        monkeypatch.setattr(offline, '_fetch', lambda url, entry: pytest.fail(f'fetched {url}'))
+        monkeypatch.setattr(app_module, 'reference_cache', offline)
+
+        response = client.get('/api/reference-config?printer=trident&board=octopus&revision=rev_a')
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['content'] == '# Firmware/printer-octopus-rev-a.cfg\n[mcu]\n'
+
+
+class TestReferenceSections:
+    """Test section-level retrieval of reference configs."""
+
+    BODY = (
+        b'# LDO reference\n'
+        b'[mcu]\n'
+        b'serial: /dev/serial/by-id/usb-Klipper  # change me\n'
+        b'\n'
+        b'[tmc5160 stepper_x]\n'
+        b'cs_pin: PA15\n'
+        b'run_current: 1.4\n'
+        b'\n'
+        b'[gcode_macro PRINT_START]\n'
+        b'gcode:\n'
+        b'    G28\n'
+        b'    G90\n'
+    )
+
+    @pytest.fixture
+    def reference(self, served_reference):
+        served_reference.body = self.BODY
+        return '/api/reference-config/{}?printer=voron2.4&board=leviathan&revision=rev_d'
+
+    def test_parse_spans_and_values(self):
+        """Test that sections, keys, inline comments and gcode blocks are indexed."""
+        parsed = app_module.parse_reference_config(self.BODY)
+
+        assert [s['name'] for s in parsed['sections']] == ['mcu', 'tmc5160 stepper_x', 'gcode_macro PRINT_START']
+        mcu, stepper, macro = parsed['sections']
+        assert mcu['keys']['serial'] == {'value': '/dev/serial/by-id/usb-Klipper', 'line': 3, 'end_line': 3}
+        assert (stepper['start_line'], stepper['end_line']) == (5, 7)
+        assert macro['keys']['gcode'] == {'value': 'G28\nG90', 'line': 10, 'end_line': 12}
+
+    def test_sections_listing(self, client, reference):
+        """Test that the listing carries names, spans and key names but no values."""
+        data = json.loads(client.get(reference.format('sections')).data)
+
+        assert data['success'] is True
+        assert data['sections'][1] == {
+            'name': 'tmc5160 stepper_x', 'start_line': 5, 'end_line': 7, 'keys': ['cs_pin', 'run_current'],
+        }
+
+    def test_single_section(self, client, reference):
+        """Test fetching one section by name."""
+        response = client.get(reference.format('section') + '&section=tmc5160 stepper_x')
+
+        section = json.loads(response.data)['section']
+        assert section['text'] == '[tmc5160 stepper_x]\ncs_pin: PA15\nrun_current: 1.4'
+        assert section['keys']['run_current']['value'] == '1.4'
+
+    def test_unknown_section_returns_404(self, client, reference):
+        """Test that a missing section name is a 404."""
+        response = client.get(reference.format('section') + '&section=extruder')
+
+        assert response.status_code == 404
+
+
+class TestReferenceDiff:
+    """Test the generated-vs-reference diff endpoint."""
+
+    OPTIONS = {'printer': 'voron2.4', 'main_board': 'leviathan'}
+    REFERENCE = {'printer': 'voron2.4', 'board': 'leviathan', 'revision': 'rev_d'}
+
+    def generated(self):
+        options = app_module.resolve_generate_options(self.OPTIONS)
+        return app_module.get_generated_config(options)[0]
+
+    def diff(self, client):
+        response = client.post('/api/reference-config/diff', json={'options': self.OPTIONS, 'reference': self.REFERENCE})
+        assert response.status_code == 200
+        return json.loads(response.data)
+
+    def test_identical_reference_has_no_sections(self, client, served_reference):
+        """Test that matching sections are only counted."""
+        served_reference.body = self.generated().encode('utf-8')
+
+        data = self.diff(client)
+
+        assert data['sections'] == []
+        assert data['summary']['changed'] == data['summary']['added'] == data['summary']['removed'] == 0
+        assert data['summary']['unchanged'] > 0
+
+    def test_key_level_changes(self, client, served_reference):
+        """Test that changed, added and removed keys and sections are reported."""
+        body = self.generated().replace('\n[mcu]\n', '\n[mcu]\ncanbus_uuid: 0123456789ab\n', 1)
+        served_reference.body = (body + '\n[temperature_sensor chamber]\nsensor_type: ATC Semitec 104GT-2\n').encode('utf-8')
+
+        data = self.diff(client)
+
+        by_name = {section['name']: section for section in data['sections']}
+        assert by_name['mcu']['status'] == 'changed'
+        assert by_name['mcu']['removed'] == {'canbus_uuid': '0123456789ab'}
+        assert by_name['temperature_sensor chamber']['status'] == 'removed'
+        assert data['summary']['changed'] == 1
+
+    def test_repeat_diff_is_cached(self, client, served_reference):
+        """Test that a repeated comparison is answered from the diff cache."""
+        served_reference.body = self.generated().encode('utf-8')
+        self.diff(client)
+        hits = app_module.reference_diff_cache.hits
+
+        data = self.diff(client)
+
+        assert app_module.reference_diff_cache.hits == hits + 1
+        assert data['generated_hash'] == app_module.hashlib.sha256(self.generated().encode('utf-8')).hexdigest()
+
+    @pytest.mark.parametrize('body', [
+        {'reference': 'x'},
+        {'options': ['a']},
+        {'reference': {'printer': ['x']}},
+        {'reference': {'revision': 4}},
+        ['options'],
+    ])
+    def test_malformed_body_is_rejected(self, client, body):
+        """Test that non-object options or reference get a 400 instead of a traceback."""
+        response = client.post('/api/reference-config/diff', json=body)
+
+        assert response.status_code == 400
+        assert json.loads(response.data)['success'] is False